@@ -1,95 +1,93 @@
 """
 分析模型表现，找出问题原因
 """
-from stable_baselines3 import PPO
-from env import DecisionEnv
+from numpy_policy import load_policy
+from rollout import chunk_seeds, run_episodes, SUCCESS, COLLISION, TIMEOUT
+from streaming_stats import RunningMoments, StreamingDistribution
 import numpy as np
-import matplotlib.pyplot as plt
 
-def analyze_performance(num_episodes=20):
-    """详细分析模型表现"""
-    env = DecisionEnv()
-    model = PPO.load("ppo_decision")
-    
-    # 统计数据
-    episodes_data = []
-    action_counts = {0: 0, 1: 0, 2: 0, 3: 0}  # up, down, left, right
+class PerformanceStats:
+    """analyze_performance 用到的全部统计量，按块更新，不保留每个episode的数据"""
+
+    def __init__(self, near_dist=10.0, max_dist=200.0, step_size=1.0):
+        self.near_dist = near_dist
+        self.step_size = step_size
+        self.num_episodes = 0
+        self.num_steps = 0
+        self.outcome_counts = np.zeros(3, dtype=np.int64)
+        self.action_counts = np.zeros(4, dtype=np.int64)
+        self.near_target_actions = np.zeros(4, dtype=np.int64)
+        self.close_but_failed_actions = np.zeros(4, dtype=np.int64)
+        self.min_dist = StreamingDistribution(0.0, max_dist)
+        self.final_dist = StreamingDistribution(0.0, max_dist)
+        self.close_but_failed_min_dist = RunningMoments()
+        self.close_but_failed_final_dist = RunningMoments()
+
+    @property
+    def speed(self):
+        """速度：每次移动固定距离，有步数时恒为 step_size"""
+        return self.step_size if self.num_steps > 0 else 0.0
+
+    def update(self, rollout_result):
+        """加入一块episode（RolloutResult）"""
+        num_episodes = rollout_result.num_episodes
+        actions = np.asarray(rollout_result.actions)
+        min_dists = np.minimum.reduceat(rollout_result.point_dist_to_dest(), rollout_result.point_offsets[:-1])
+        step_episode = np.repeat(np.arange(num_episodes), rollout_result.length)
+        near_target_steps = rollout_result.step_dist_before() < self.near_dist
+        close_but_failed = (min_dists < self.near_dist) & (rollout_result.outcome != SUCCESS)
+        
+        self.num_episodes += num_episodes
+        self.num_steps += len(actions)
+        self.outcome_counts += np.bincount(rollout_result.outcome, minlength=3)
+        self.action_counts += np.bincount(actions, minlength=4)
+        self.near_target_actions += np.bincount(actions[near_target_steps], minlength=4)
+        self.close_but_failed_actions += np.bincount(
+            actions[near_target_steps & close_but_failed[step_episode]], minlength=4
+        )
+        self.min_dist.update(min_dists)
+        self.final_dist.update(rollout_result.final_dist)
+        self.close_but_failed_min_dist.update(min_dists[close_but_failed])
+        self.close_but_failed_final_dist.update(rollout_result.final_dist[close_but_failed])
+
+
+def analyze_performance(num_episodes=20, policy_path="ppo_decision", num_envs=256, seed=None, rollout_result=None,
+                        chunk_episodes=10_000):
+    """
+    详细分析模型表现
+    episode按 chunk_episodes 分块运行并流式统计，内存占用与episode总数无关
+    rollout_result: 已有的 RolloutResult（可以是 trajectory_store 的内存映射结果），传入时直接读取，不再重新运行
+    """
+    stats = PerformanceStats()
+    if rollout_result is not None:
+        for start in range(0, rollout_result.num_episodes, chunk_episodes):
+            stop = min(start + chunk_episodes, rollout_result.num_episodes)
+            stats.update(rollout_result.episodes(start, stop))
+    else:
+        model = load_policy(policy_path)
+        starts = range(0, num_episodes, chunk_episodes)
+        for start, chunk_seed in zip(starts, chunk_seeds(seed, len(starts))):
+            n = min(chunk_episodes, num_episodes - start)
+            stats.update(run_episodes(model, n, num_envs=num_envs, seed=chunk_seed))
+    num_episodes = stats.num_episodes
+    
     action_names = {0: "up", 1: "down", 2: "left", 3: "right"}
+    action_counts = dict(enumerate(stats.action_counts.tolist()))  # up, down, left, right
     
     print("=" * 80)
     print("详细性能分析")
     print("=" * 80)
     
-    for episode in range(num_episodes):
-        obs, _ = env.reset()
-        trajectory = [env.ego_pos.copy()]
-        initial_dist = np.linalg.norm(env.destination - env.ego_pos)
-        episode_actions = []
-        episode_rewards = []
-        episode_distances = [initial_dist]
-        episode_speeds = []
-        
-        total_reward = 0
-        steps = 0
-        
-        while steps < 200:
-            action, _ = model.predict(obs, deterministic=True)
-            action = int(action)
-            obs, reward, done, truncated, _ = env.step(action)
-            
-            trajectory.append(env.ego_pos.copy())
-            episode_actions.append(action)
-            episode_rewards.append(reward)
-            action_counts[action] += 1
-            
-            dist_to_dest = np.linalg.norm(env.destination - env.ego_pos)
-            dist_to_obs = np.linalg.norm(env.obs_pos - env.ego_pos)
-            # 移除速度相关，因为新模型不考虑速度
-            speed = 1.0  # 固定速度，因为每次移动固定距离
-            
-            episode_distances.append(dist_to_dest)
-            episode_speeds.append(speed)
-            total_reward += reward
-            steps += 1
-            
-            if done or truncated:
-                break
-        
-        # 判断结果
-        final_dist = np.linalg.norm(env.destination - env.ego_pos)
-        final_dist_obs = np.linalg.norm(env.obs_pos - env.ego_pos)
-        
-        if final_dist_obs < 2.0:
-            result = "collision"
-        elif final_dist < 8.0:  # 更新阈值以匹配环境
-            result = "success"
-        else:
-            result = "timeout"
-        
-        episodes_data.append({
-            'result': result,
-            'total_reward': total_reward,
-            'steps': steps,
-            'initial_dist': initial_dist,
-            'final_dist': final_dist,
-            'min_dist': min(episode_distances),
-            'actions': episode_actions,
-            'rewards': episode_rewards,
-            'distances': episode_distances,
-            'speeds': episode_speeds,
-            'trajectory': np.array(trajectory)
-        })
-    
     # 打印统计
     print(f"\n总体统计 ({num_episodes} episodes):")
     print("-" * 80)
-    success = [e for e in episodes_data if e['result'] == 'success']
-    collision = [e for e in episodes_data if e['result'] == 'collision']
-    timeout = [e for e in episodes_data if e['result'] == 'timeout']
+    success_count = int(stats.outcome_counts[SUCCESS])
+    collision_count = int(stats.outcome_counts[COLLISION])
+    timeout_count = int(stats.outcome_counts[TIMEOUT])
     
-    print(f"成功: {len(success)} ({len(success)/num_episodes*100:.1f}%)")
-    print(f"碰撞: {len(collision)} ({len(collision)/num_episodes*100:.1f}%)")
-    print(f"超时: {len(timeout)} ({len(timeout)/num_episodes*100:.1f}%)")
+    print(f"成功: {success_count} ({success_count/num_episodes*100:.1f}%)")
+    print(f"碰撞: {collision_count} ({collision_count/num_episodes*100:.1f}%)")
+    print(f"超时: {timeout_count} ({timeout_count/num_episodes*100:.1f}%)")
     
     # 动作使用统计
     print(f"\n动作使用统计:")
@@ -102,41 +100,31 @@ def analyze_performance(num_episodes=20):
     # 距离分析
     print(f"\n距离分析:")
     print("-" * 80)
-    all_min_dists = [e['min_dist'] for e in episodes_data]
-    all_final_dists = [e['final_dist'] for e in episodes_data]
     print(f"最小距离 (所有episodes):")
-    print(f"  平均: {np.mean(all_min_dists):.2f}")
-    print(f"  最小: {np.min(all_min_dists):.2f}")
-    print(f"  最大: {np.max(all_min_dists):.2f}")
-    print(f"  中位数: {np.median(all_min_dists):.2f}")
+    print(f"  平均: {stats.min_dist.mean:.2f}")
+    print(f"  最小: {stats.min_dist.min:.2f}")
+    print(f"  最大: {stats.min_dist.max:.2f}")
+    print(f"  中位数: {stats.min_dist.median:.2f}")
     
     print(f"\n最终距离 (所有episodes):")
-    print(f"  平均: {np.mean(all_final_dists):.2f}")
-    print(f"  最小: {np.min(all_final_dists):.2f}")
-    print(f"  最大: {np.max(all_final_dists):.2f}")
-    print(f"  中位数: {np.median(all_final_dists):.2f}")
+    print(f"  平均: {stats.final_dist.mean:.2f}")
+    print(f"  最小: {stats.final_dist.min:.2f}")
+    print(f"  最大: {stats.final_dist.max:.2f}")
+    print(f"  中位数: {stats.final_dist.median:.2f}")
     
     # 速度分析
     print(f"\n速度分析:")
     print("-" * 80)
-    all_speeds = []
-    for e in episodes_data:
-        all_speeds.extend(e['speeds'])
-    print(f"平均速度: {np.mean(all_speeds):.2f}")
-    print(f"速度范围: {np.min(all_speeds):.2f} - {np.max(all_speeds):.2f}")
-    print(f"速度中位数: {np.median(all_speeds):.2f}")
+    print(f"平均速度: {stats.speed:.2f}")
+    print(f"速度范围: {stats.speed:.2f} - {stats.speed:.2f}")
+    # 固定速度，中位数等于均值
+    print(f"速度中位数: {stats.speed:.2f}")
     
     # 分析接近目标时的行为
     print(f"\n接近目标时的行为分析 (距离 < 10):")
     print("-" * 80)
-    near_target_actions = {0: 0, 1: 0, 2: 0, 3: 0}
-    near_target_count = 0
-    for e in episodes_data:
-        for i, dist in enumerate(e['distances']):
-            if dist < 10.0 and i < len(e['actions']):
-                action = e['actions'][i]
-                near_target_actions[action] += 1
-                near_target_count += 1
+    near_target_actions = dict(enumerate(stats.near_target_actions.tolist()))
+    near_target_count = sum(near_target_actions.values())
     
     if near_target_count > 0:
         print(f"在距离 < 10 时的动作分布:")
@@ -147,22 +135,16 @@ def analyze_performance(num_episodes=20):
     # 分析成功接近但未到达的episodes
     print(f"\n接近目标但未到达的episodes (最小距离 < 10 但未成功):")
     print("-" * 80)
-    close_but_failed = [e for e in episodes_data if e['min_dist'] < 10.0 and e['result'] != 'success']
-    print(f"数量: {len(close_but_failed)}")
-    if len(close_but_failed) > 0:
-        print(f"平均最小距离: {np.mean([e['min_dist'] for e in close_but_failed]):.2f}")
-        print(f"平均最终距离: {np.mean([e['final_dist'] for e in close_but_failed]):.2f}")
+    close_but_failed_count = stats.close_but_failed_min_dist.count
+    print(f"数量: {close_but_failed_count}")
+    if close_but_failed_count > 0:
+        print(f"平均最小距离: {stats.close_but_failed_min_dist.mean:.2f}")
+        print(f"平均最终距离: {stats.close_but_failed_final_dist.mean:.2f}")
         
         # 分析这些episodes在接近时的动作
         print(f"\n这些episodes在接近目标时的动作:")
-        near_actions = {0: 0, 1: 0, 2: 0, 3: 0}
-        near_count = 0
-        for e in close_but_failed:
-            for i, dist in enumerate(e['distances']):
-                if dist < 10.0 and i < len(e['actions']):
-                    action = e['actions'][i]
-                    near_actions[action] += 1
-                    near_count += 1
+        near_actions = dict(enumerate(stats.close_but_failed_actions.tolist()))
+        near_count = sum(near_actions.values())
         
         if near_count > 0:
             for action_id, count in near_actions.items():
@@ -194,16 +176,16 @@ def analyze_performance(num_episodes=20):
             issues.append("⚠️  接近目标时动作选择过于单一，可能导致无法有效到达")
     
     # 4. 检查到达阈值
-    if len(close_but_failed) > 0:
-        avg_min_dist = np.mean([e['min_dist'] for e in close_but_failed])
+    if close_but_failed_count > 0:
+        avg_min_dist = stats.close_but_failed_min_dist.mean
         if avg_min_dist < 6.0:
             issues.append(f"⚠️  很多episodes接近目标(最小距离{avg_min_dist:.2f})但未到达，到达阈值(5.0)可能过小")
     
     # 5. 检查奖励信号
-    if len(success) == 0:
+    if success_count == 0:
         issues.append("❌  成功率0%，模型可能没有学习到正确的策略")
     
-    if len(collision) > len(success):
+    if collision_count > success_count:
         issues.append("⚠️  碰撞率高于成功率，避障策略可能有问题")
     
     if issues:
@@ -219,18 +201,18 @@ def analyze_performance(num_episodes=20):
     
     suggestions = []
     
-    if len(close_but_failed) > 0 and near_target_count > 0:
+    if close_but_failed_count > 0 and near_target_count > 0:
         # 检查接近目标时的动作分布
         action_diversity = len([c for c in near_target_actions.values() if c > 0]) / len(near_target_actions)
         if action_diversity < 0.5:
             suggestions.append("1. 在接近目标时(距离<10)增加朝向目标方向动作的奖励")
             suggestions.append("2. 优化奖励函数，鼓励模型在接近目标时选择更直接的动作")
     
-    if np.mean(all_speeds) < 4.0:
+    if stats.speed < 4.0:
         suggestions.append("3. 考虑提高最大速度限制(当前5.0)，或增加速度奖励")
     
-    if len(close_but_failed) > 0:
-        avg_min_dist = np.mean([e['min_dist'] for e in close_but_failed])
+    if close_but_failed_count > 0:
+        avg_min_dist = stats.close_but_failed_min_dist.mean
         if avg_min_dist < 6.0:
             suggestions.append("4. 考虑增大到达目标的阈值(当前5.0)，或添加更平滑的到达奖励")
     
@@ -239,15 +221,15 @@ def analyze_performance(num_episodes=20):
     if max_action_ratio > 0.7:
         suggestions.append("5. 增加朝向目标方向动作的奖励，鼓励向目标移动")
     
-    if len(success) == 0:
+    if success_count == 0:
         suggestions.append("6. 增加训练时间或调整学习率")
         suggestions.append("7. 检查奖励函数是否平衡，确保成功奖励足够大")
     
     for suggestion in suggestions:
         print(f"  {suggestion}")
     
-    return episodes_data, action_counts
+    return stats, action_counts
 
 if __name__ == "__main__":
-    episodes_data, action_counts = analyze_performance(num_episodes=20)
+    stats, action_counts = analyze_performance(num_episodes=20)
 
@@ -0,0 +1,134 @@
+"""
+DecisionEnv 的原生批量版本（纯NumPy，不依赖torch/SB3）
+N 个环境的状态保存在 (N, 2) float32 数组中，一次向量化 step 推进全部环境
+"""
+import numpy as np
+from gymnasium import spaces
+
+from env import (ACTION_DIRS, MAX_EPISODE_STEPS, OBS_MODES, make_observation, observation_space, sample_obstacles,
+                 sample_scenarios)
+from obstacle_grid import ObstacleGrid
+from reward import DEFAULT_REWARD_CONFIG, compute_rewards
+
+
+class BatchDecisionEnv:
+    """
+    批量决策环境
+
+    奖励由 reward.compute_rewards 计算（与 DecisionEnv.step 相同），结束的槽位自动重置
+    num_obstacles > 1 时每个环境有多个障碍物（网格索引，只检查ego附近的障碍物），obs_pos 为最近的障碍物
+    """
+
+    def __init__(self, num_envs, seed=None, max_episode_steps=MAX_EPISODE_STEPS, scenario_bank=None,
+                 normalize_obs=False, obs_mode="absolute", num_obstacles=1):
+        self.render_mode = None
+        self.step_size = 1.0
+        self.num_envs = num_envs
+        # episode步数上限，None为不限制
+        self.max_episode_steps = max_episode_steps
+        # 观察模式和归一化与 DecisionEnv 相同
+        if obs_mode not in OBS_MODES:
+            raise ValueError(f"未知的观察模式: {obs_mode}")
+        self.obs_mode = obs_mode
+        self.normalize_obs = normalize_obs
+        self.observation_space = observation_space(normalize_obs, obs_mode)
+        self.action_space = spaces.Discrete(4)
+
+        self._rng = np.random.default_rng(seed)
+        # 固定场景库：设置后第 k 个开始的episode使用场景 k（超出场景数后循环）
+        self.scenario_bank = scenario_bank
+        self._moves = ACTION_DIRS * np.float32(self.step_size)
+
+        # 状态数组：ego_pos / destination / obs_pos 是预分配观察缓冲区的列视图
+        self._obs_buf = np.zeros((num_envs, 6), dtype=np.float32)
+        self.ego_pos = self._obs_buf[:, 0:2]
+        self.destination = self._obs_buf[:, 2:4]
+        self.obs_pos = self._obs_buf[:, 4:6]
+        self.initial_dist_to_dest = np.zeros(num_envs, dtype=np.float32)
+        self.last_dist_to_dest = np.zeros(num_envs, dtype=np.float32)
+        self.num_obstacles = num_obstacles
+        self.obstacles = None
+        if num_obstacles > 1:
+            if scenario_bank is not None:
+                raise ValueError("多障碍物环境不支持场景库")
+            # 查询半径为警告半径：半径外的障碍物对奖励没有影响
+            self.obstacles = ObstacleGrid(num_envs, num_obstacles, radius=DEFAULT_REWARD_CONFIG["warning_radius"])
+        self.elapsed_steps = np.zeros(num_envs, dtype=np.int64)
+        # 每个槽位当前episode的编号（按开始顺序从0递增）
+        self.episode_ids = np.zeros(num_envs, dtype=np.int64)
+        self._next_episode_id = 0
+
+    def reset_slots(self, idx):
+        """重置指定槽位（idx 为索引数组），按 idx 的顺序分配新的episode编号"""
+        ids = self._next_episode_id + np.arange(len(idx))
+        self._next_episode_id += len(idx)
+        self.episode_ids[idx] = ids
+        if self.scenario_bank is None:
+            destination, obs_pos = sample_scenarios(self._rng, len(idx))
+        else:
+            bank_ids = ids % len(self.scenario_bank)
+            destination = self.scenario_bank.destination[bank_ids]
+            obs_pos = self.scenario_bank.obs_pos[bank_ids]
+        self.ego_pos[idx] = 0.0
+        self.destination[idx] = destination
+        self.obs_pos[idx] = obs_pos
+        if self.obstacles is not None:
+            self.obstacles.build(idx, sample_obstacles(self._rng, destination, obs_pos, self.num_obstacles))
+            self.obs_pos[idx] = self.obstacles.nearest(self.ego_pos[idx], idx)
+        dist = np.sqrt(destination[:, 0] * destination[:, 0] + destination[:, 1] * destination[:, 1])
+        self.initial_dist_to_dest[idx] = dist
+        self.last_dist_to_dest[idx] = dist
+        self.elapsed_steps[idx] = 0
+
+    def _get_obs(self):
+        return make_observation(self._obs_buf, self.obs_mode, self.normalize_obs)
+
+    def reset(self, seed=None):
+        """重置所有槽位，seed不为None时重新设置随机数生成器"""
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+        self._next_episode_id = 0
+        self.reset_slots(np.arange(self.num_envs))
+        return self._get_obs()
+
+    def step(self, actions):
+        """
+        所有环境前进一步，返回 (obs, rewards, dones, infos)，与 SB3 VecEnv.step 格式相同
+        结束（终止或达到步数上限）的槽位自动重置，终止前的观察放在 infos[i]["terminal_observation"] 中，
+        达到步数上限时 infos[i]["TimeLimit.truncated"] 为True
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+        ego = self.ego_pos
+        ego += self._moves[actions]
+
+        if self.obstacles is None:
+            reward, dist_to_dest, arrived, collided = compute_rewards(
+                ego, self.destination, self.obs_pos, actions,
+                self.last_dist_to_dest, self.initial_dist_to_dest,
+            )
+        else:
+            candidates = self.obstacles.query(ego)
+            reward, dist_to_dest, arrived, collided = compute_rewards(
+                ego, self.destination, candidates[1], actions,
+                self.last_dist_to_dest, self.initial_dist_to_dest, obs_rows=candidates[0],
+            )
+            self.obs_pos[:] = self.obstacles.nearest(ego, candidates=candidates)
+        self.last_dist_to_dest[:] = dist_to_dest
+        terminated = arrived | collided
+        self.elapsed_steps += 1
+        if self.max_episode_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = ~terminated & (self.elapsed_steps >= self.max_episode_steps)
+        dones = terminated | truncated
+
+        infos = [{} for _ in range(self.num_envs)]
+        obs = self._get_obs()
+        if dones.any():
+            done_idx = np.flatnonzero(dones)
+            for i in done_idx:
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+            self.reset_slots(done_idx)
+            obs = self._get_obs()
+        return obs, reward.astype(np.float32, copy=False), dones, infos
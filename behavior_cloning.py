@@ -0,0 +1,178 @@
+"""
+行为克隆：用专家策略批量生成 (观察, 动作) 数据集，并在PPO训练前用监督学习预训练 MlpPolicy
+
+生成数据: python behavior_cloning.py --episodes 20000 --output bc_dataset.npz [--expert scripted|planner]
+预训练后训练: python train.py --pretrain bc_dataset.npz
+"""
+import argparse
+
+import numpy as np
+
+from env import ACTION_DIRS, make_observation
+from rollout import SUCCESS, run_episodes
+
+
+class ScriptedExpert:
+    """
+    规则专家（批量）："朝目标走，障碍物挡路时侧移绕开"
+    沿到目标差值较大的坐标轴前进；障碍物在前方 ahead 范围内且横向距离小于 margin 时，向远离障碍物的一侧移动
+    predict 接口与SB3相同，可直接传给 rollout.run_episodes
+    """
+
+    def __init__(self, margin=3.5, ahead=12.0):
+        self.margin = margin
+        self.ahead = ahead
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        obs = np.asarray(observation, dtype=np.float32)
+        single = obs.ndim == 1
+        obs = obs.reshape(-1, 6)
+        to_dest = obs[:, 2:4] - obs[:, 0:2]
+        to_obs = obs[:, 4:6] - obs[:, 0:2]
+        # action: 0=上(y+), 1=下(y-), 2=左(x-), 3=右(x+)
+        actions = np.where(
+            np.abs(to_dest[:, 0]) >= np.abs(to_dest[:, 1]),
+            np.where(to_dest[:, 0] > 0, 3, 2),
+            np.where(to_dest[:, 1] > 0, 0, 1),
+        )
+        blocked = (to_obs[:, 0] > -1.0) & (to_obs[:, 0] < self.ahead) & (np.abs(to_obs[:, 1]) < self.margin)
+        actions = np.where(blocked, np.where(to_obs[:, 1] > 0, 1, 0), actions)
+        if single:
+            actions = actions.squeeze(axis=0)
+        return actions, state
+
+
+def discounted_returns(rewards, step_offsets, gamma=0.99):
+    """每一步的折扣回报（到episode结束为止），rewards 按episode拼接，episode i 占 step_offsets[i]:step_offsets[i+1]"""
+    lengths = np.diff(step_offsets)
+    step_episode = np.repeat(np.arange(len(lengths)), lengths)
+    step_index = np.arange(len(rewards)) - step_offsets[step_episode]
+    # 补齐为 (episode数, 最大长度) 的矩阵，从后往前累加
+    padded = np.zeros((len(lengths), lengths.max(initial=0) + 1))
+    padded[step_episode, step_index] = rewards
+    for t in range(padded.shape[1] - 2, -1, -1):
+        padded[:, t] += gamma * padded[:, t + 1]
+    return padded[step_episode, step_index]
+
+
+def rollout_to_dataset(rollout_result, successful_only=True, gamma=0.99):
+    """
+    把 RolloutResult 转为 (observations, actions, returns)：
+    每一步执行动作前的观察、该动作和从该步开始的折扣回报
+    """
+    keep = rollout_result.outcome == SUCCESS if successful_only else np.ones(rollout_result.num_episodes, bool)
+    step_episode = np.repeat(np.arange(rollout_result.num_episodes), rollout_result.length)
+    # 第 s 步执行前的轨迹点为 s + episode编号
+    before = np.asarray(rollout_result.positions)[np.arange(len(step_episode)) + step_episode]
+    mask = keep[step_episode]
+    returns = discounted_returns(np.asarray(rollout_result.rewards, dtype=np.float64), rollout_result.step_offsets, gamma)
+    observations = np.concatenate([
+        before[mask],
+        np.asarray(rollout_result.destination)[step_episode[mask]],
+        np.asarray(rollout_result.obs_pos)[step_episode[mask]],
+    ], axis=1).astype(np.float32)
+    actions = np.asarray(rollout_result.actions)[mask].astype(np.int8)
+    return observations, actions, returns[mask].astype(np.float32)
+
+
+def planner_dataset(scenario_bank, gamma=0.99):
+    """
+    planner.py 的最优动作序列转为 (observations, actions, returns)
+    按同一个 gamma 的折扣回报规划：不折扣的最优序列会在目标附近徘徊到步数上限（见 planner.solve_scenario），
+    折扣后尽快到达，与PPO优化的目标一致
+    环境是确定性的，轨迹由动作的累积位移直接得到，奖励用 reward.compute_rewards 计算，不需要运行环境
+    """
+    from planner import solve_scenario
+    from reward import compute_rewards
+
+    observations, actions, rewards, lengths = [], [], [], []
+    for destination, obs_pos in zip(scenario_bank.destination, scenario_bank.obs_pos):
+        plan = solve_scenario(destination, obs_pos, gamma=gamma)["actions"]
+        points = np.concatenate([np.zeros((1, 2), np.float32), np.cumsum(ACTION_DIRS[plan], axis=0)])
+        before = points[:-1]
+        dest = np.broadcast_to(destination, before.shape)
+        obs = np.broadcast_to(obs_pos, before.shape)
+        to_dest = dest - before
+        last_dist = np.sqrt(to_dest[:, 0] * to_dest[:, 0] + to_dest[:, 1] * to_dest[:, 1])
+        step_rewards, _, _, _ = compute_rewards(points[1:], dest, obs, plan, last_dist, np.full(len(plan), last_dist[0]))
+        observations.append(np.concatenate([before, dest, obs], axis=1))
+        actions.append(plan)
+        rewards.append(step_rewards)
+        lengths.append(len(plan))
+    step_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    returns = discounted_returns(np.concatenate(rewards), step_offsets, gamma)
+    return (np.concatenate(observations).astype(np.float32), np.concatenate(actions).astype(np.int8),
+            returns.astype(np.float32))
+
+
+def generate_dataset(num_episodes, output="bc_dataset.npz", expert="scripted", num_envs=1024, seed=None):
+    """
+    用专家生成 num_episodes 个episode，写入 output（observations float32, actions int8, returns float32），
+    规则专家只保留成功的episode
+    expert: "scripted"（ScriptedExpert，批量推理，很快）或 "planner"（planner.py 按折扣回报的最优动作，每个场景约0.2秒）
+    """
+    if expert == "scripted":
+        result = run_episodes(ScriptedExpert(), num_episodes, num_envs=num_envs, seed=seed)
+        observations, actions, returns = rollout_to_dataset(result)
+    elif expert == "planner":
+        from scenario_bank import generate_bank
+        observations, actions, returns = planner_dataset(generate_bank(num_episodes, seed=0 if seed is None else seed))
+    else:
+        raise ValueError(f"未知的专家: {expert}")
+    np.savez(output, observations=observations, actions=actions, returns=returns)
+    return output
+
+
+def pretrain(model, dataset_path, epochs=5, batch_size=256, learning_rate=1e-3, seed=0, verbose=1,
+             normalize_obs=False, obs_mode="absolute"):
+    """
+    用数据集对 model.policy 做监督预训练，返回每轮的平均损失：
+    动作分布最小化专家动作的负对数似然，价值网络回归专家的折扣回报
+    （只预训练动作分布时，PPO开始阶段未训练的价值网络会让策略明显退化）
+    normalize_obs, obs_mode: 模型使用的观察（数据集中保存的是原始观察，训练前转换）
+    """
+    import torch as th
+
+    with np.load(dataset_path) as data:
+        observations = data["observations"]
+        actions = data["actions"].astype(np.int64)
+        returns = data["returns"]
+    observations = make_observation(observations, obs_mode, normalize_obs)
+    policy = model.policy
+    policy.set_training_mode(True)
+    optimizer = th.optim.Adam(policy.parameters(), lr=learning_rate)
+    rng = np.random.default_rng(seed)
+
+    losses = []
+    for epoch in range(epochs):
+        order = rng.permutation(len(actions))
+        total = 0.0
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            obs_tensor = th.as_tensor(observations[idx], device=policy.device)
+            act_tensor = th.as_tensor(actions[idx], device=policy.device)
+            ret_tensor = th.as_tensor(returns[idx], device=policy.device)
+            values, log_prob, _ = policy.evaluate_actions(obs_tensor, act_tensor)
+            loss = -log_prob.mean() + model.vf_coef * th.nn.functional.mse_loss(values.flatten(), ret_tensor)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(idx)
+        losses.append(total / len(order))
+        if verbose > 0:
+            print(f"BC epoch {epoch + 1}/{epochs}: loss={losses[-1]:.4f}")
+    policy.set_training_mode(False)
+    return losses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成行为克隆数据集")
+    parser.add_argument("--episodes", type=int, default=20_000, help="专家episode数")
+    parser.add_argument("--expert", choices=["scripted", "planner"], default="scripted", help="专家策略（planner 按 gamma=0.99 的折扣回报规划，直接到达目标）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--output", default="bc_dataset.npz", help="输出文件")
+    args = parser.parse_args()
+
+    path = generate_dataset(args.episodes, args.output, args.expert, seed=args.seed)
+    with np.load(path) as data:
+        print(f"{len(data['actions'])} transitions saved as: {path}")
@@ -0,0 +1,204 @@
+"""
+性能基准测试：环境step/reset吞吐量、策略推理延迟、端到端评估速度
+结果写入JSON文件，便于在不同提交之间比较
+
+用法: python benchmark.py [--policy ppo_decision] [--output benchmark_results.json] [--quick]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+from batch_env import BatchDecisionEnv
+from env import ACTION_AXIS, ACTION_SIGN, DecisionEnv, _norm2
+from numpy_policy import load_policy
+from reward import scalar_reward, scalar_reward_params
+from rollout import run_episodes
+
+# 奖励各项的消融设置：关闭该项的配置（半径为0时该项的分支不执行），其余各项（每步惩罚、进度、距离）总是计算
+REWARD_TERM_ABLATIONS = {
+    "direction": {"direction_weight": 0.0},
+    "obstacle_warning": {"warning_radius": 0.0},
+    "avoidance": {"avoidance_radius": 0.0},
+    "emergency": {"emergency_radius": 0.0},
+    "arrival": {"arrival_radius": 0.0},
+    "collision": {"collision_radius": 0.0},
+}
+
+
+def _timeit(fn, repeat):
+    """运行 fn repeat 次，返回总耗时（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def bench_scalar_step(num_steps):
+    env = DecisionEnv()
+    env.reset(seed=0)
+    actions = np.random.default_rng(0).integers(0, 4, num_steps).tolist()
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    return {"steps_per_sec": num_steps / (time.perf_counter() - start)}
+
+
+def bench_obstacle_step(obstacle_counts, num_steps):
+    """
+    单环境step吞吐量随障碍物数的变化（障碍物分布在固定区域内，数量越多密度越大）；
+    动作偏向目标，使ego穿过障碍物区域。障碍物越多碰撞越早、reset越频繁，reset的耗时单独计时，不计入step
+    """
+    results = {}
+    rng = np.random.default_rng(0)
+    actions = np.where(rng.random(num_steps) < 0.7, 3, rng.integers(0, 4, num_steps)).tolist()
+    for num_obstacles in obstacle_counts:
+        env = DecisionEnv(num_obstacles=num_obstacles)
+        env.reset(seed=0)
+        reset_time, num_resets = 0.0, 0
+        start = time.perf_counter()
+        for action in actions:
+            _, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                reset_start = time.perf_counter()
+                env.reset()
+                reset_time += time.perf_counter() - reset_start
+                num_resets += 1
+        elapsed = time.perf_counter() - start
+        results[str(num_obstacles)] = {
+            "steps_per_sec": num_steps / (elapsed - reset_time),
+            "resets_per_sec": num_resets / reset_time if num_resets else None,
+        }
+    return results
+
+
+def _reward_inputs(num_steps, seed=0):
+    """scalar_reward 的参数序列：用偏向目标的随机动作运行 DecisionEnv，按 step 的方式记录每一步的参数"""
+    env = DecisionEnv()
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for _ in range(num_steps):
+        action = 3 if rng.random() < 0.7 else int(rng.integers(0, 4))
+        last_dist = env.last_dist_to_dest
+        _, _, terminated, truncated, _ = env.step(action)
+        ego_x, ego_y = env.ego_pos
+        to_dest = (env.destination[0] - ego_x, env.destination[1] - ego_y)
+        to_obs = (env.obs_pos[0] - ego_x, env.obs_pos[1] - ego_y)
+        inputs.append((ACTION_AXIS[action], ACTION_SIGN[action], to_dest, _norm2(*to_dest), last_dist,
+                       env.initial_dist_to_dest, ((to_obs, _norm2(*to_obs)),)))
+        if terminated or truncated:
+            env.reset()
+    return inputs
+
+
+def bench_reward_terms(num_steps, repeat=5):
+    """
+    奖励各项的耗时（消融）：在同一组转移上分别计时完整奖励和关闭某一项后的奖励，差值为该项每步的平均耗时；
+    base 为关闭全部可关闭项后剩余的耗时（每步惩罚、进度和距离奖励以及函数调用）
+    单项的耗时只有几十纳秒，直接计时会被 perf_counter_ns 本身的开销淹没，因此只对整个循环计时
+    """
+    inputs = _reward_inputs(num_steps)
+    configs = {"full": None, **REWARD_TERM_ABLATIONS,
+               "base": {k: v for config in REWARD_TERM_ABLATIONS.values() for k, v in config.items()}}
+    params = {name: scalar_reward_params(config) for name, config in configs.items()}
+    # 各配置交替计时，取每个配置的最小值，减少CPU频率变化等系统噪声的影响
+    best = dict.fromkeys(configs, np.inf)
+    for _ in range(repeat):
+        for name in configs:
+            start = time.perf_counter_ns()
+            for args in inputs:
+                scalar_reward(params[name], *args)
+            best[name] = min(best[name], (time.perf_counter_ns() - start) / len(inputs))
+
+    results = {"full_ns": best["full"], "base_ns": best["base"]}
+    for term in REWARD_TERM_ABLATIONS:
+        results[f"{term}_ns"] = best["full"] - best[term]
+    return results
+
+
+def bench_scalar_reset(num_resets):
+    env = DecisionEnv()
+    env.reset(seed=0)
+    return {"resets_per_sec": num_resets / _timeit(env.reset, num_resets)}
+
+
+def bench_batched_step(batch_sizes, steps_per_batch):
+    results = {}
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        env = BatchDecisionEnv(batch_size)
+        env.reset(seed=0)
+        actions = rng.integers(0, 4, (steps_per_batch, batch_size))
+        start = time.perf_counter()
+        for step_actions in actions:
+            env.step(step_actions)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {"steps_per_sec": batch_size * steps_per_batch / elapsed}
+    return results
+
+
+def bench_inference(model, batch_sizes, repeat):
+    results = {}
+    env = BatchDecisionEnv(max(batch_sizes))
+    obs = env.reset(seed=0)
+    single = obs[0]
+    elapsed = _timeit(lambda: model.predict(single, deterministic=True), repeat)
+    results["single_us"] = elapsed / repeat * 1e6
+    for batch_size in batch_sizes:
+        batch = obs[:batch_size]
+        elapsed = _timeit(lambda: model.predict(batch, deterministic=True), repeat)
+        results[f"batch_{batch_size}_us"] = elapsed / repeat * 1e6
+    return results
+
+
+def bench_evaluation(model, num_episodes, num_envs):
+    start = time.perf_counter()
+    run_episodes(model, num_episodes, num_envs=num_envs, seed=0)
+    return {"episodes_per_sec": num_episodes / (time.perf_counter() - start)}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(policy_path="ppo_decision", quick=False):
+    scale = 0.1 if quick else 1.0
+    batch_sizes = [1, 16, 256, 1024, 4096]
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "policy": policy_path,
+        "scalar_step": bench_scalar_step(int(100_000 * scale)),
+        "scalar_reset": bench_scalar_reset(int(100_000 * scale)),
+        "obstacle_step": bench_obstacle_step([1, 2, 30, 300, 1000], int(100_000 * scale)),
+        "reward_terms": bench_reward_terms(int(100_000 * scale)),
+        "batched_step": bench_batched_step(batch_sizes, int(200 * scale)),
+    }
+    model = load_policy(policy_path)
+    results["inference"] = bench_inference(model, batch_sizes, int(1000 * scale))
+    results["evaluation"] = bench_evaluation(model, int(10_000 * scale), num_envs=1024)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="环境与推理性能基准测试")
+    parser.add_argument("--policy", default="ppo_decision", help="策略路径（.npz 使用NumPy推理）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果JSON文件")
+    parser.add_argument("--quick", action="store_true", help="减少迭代次数，快速运行")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.policy, args.quick)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nBenchmark results saved as: {args.output}")
@@ -1,184 +1,367 @@
+import math
+import time
+
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 
+from obstacle_grid import ObstacleGrid
+from reward import ACTION_DIRS, DEFAULT_REWARD_CONFIG, REWARD_TERMS, obstacle_sums, scalar_reward, scalar_reward_params
+
+# 默认的episode步数上限，超过后返回 truncated=True
+MAX_EPISODE_STEPS = 200
+# 多障碍物场景中其余障碍物的分布区域 (x最小, y最小), (x最大, y最大)，以及与起点/目标的最小距离
+OBSTACLE_REGION = ((-20.0, -50.0), (100.0, 50.0))
+OBSTACLE_CLEARANCE = 8.0
+# 多障碍物step中相邻单元的候选障碍物多于此数时用NumPy一次筛选，查询半径内的障碍物多于此数时障碍物各项
+# 一次向量化计算（reward.obstacle_sums）；更少时逐个计算比调用NumPy快
+VECTORIZED_OBSTACLES = 16
+# 每个动作对应的坐标轴和符号，方向点积可化简为单个分量
+ACTION_AXIS = (1, 1, 0, 0)
+ACTION_SIGN = (1.0, -1.0, -1.0, 1.0)
+
+
+def _norm2(x, y):
+    """float32二维向量长度，逐位等同于np.linalg.norm（float64开方后舍入到float32是精确的）"""
+    return np.float32(math.sqrt(x * x + y * y))
+
+
+def sample_scenarios(rng, n):
+    """
+    一次采样n个场景，返回连续的 (destination, obs_pos) 数组，形状均为 (n, 2)
+    rng: np.random.Generator（如 env.np_random）
+    """
+    # destination目标点：在初始位置前方，稍微偏移
+    dest_distance = rng.uniform(50, 80, size=n)
+    dest_angle = rng.uniform(-0.2, 0.2, size=n)
+    destination = np.stack([
+        dest_distance * np.cos(dest_angle),
+        dest_distance * np.sin(dest_angle)
+    ], axis=1).astype(np.float32)
+    
+    # 障碍物位置：在路径的30%-50%处，并在路径两侧横向偏移
+    obs_ratio = rng.uniform(0.3, 0.5, size=n)[:, None]
+    lateral_offset = rng.uniform(-5, 5, size=n)[:, None]
+    # 计算垂直于路径的方向
+    dest_norm = np.sqrt(destination[:, 0] * destination[:, 0] + destination[:, 1] * destination[:, 1])
+    path_direction = destination / (dest_norm[:, None] + np.float32(1e-6))
+    perpendicular = np.stack([-path_direction[:, 1], path_direction[:, 0]], axis=1)
+    obs_pos = (obs_ratio * destination + lateral_offset * perpendicular).astype(np.float32)
+    return destination, obs_pos
+
+
+def sample_obstacles(rng, destination, obs_pos, num_obstacles):
+    """
+    多障碍物场景的障碍物数组，形状为 (n, num_obstacles, 2)
+    第一个障碍物为 sample_scenarios 采样的 obs_pos（挡在路径上），其余在 OBSTACLE_REGION 内均匀分布，
+    离起点和目标太近（小于 OBSTACLE_CLEARANCE）的重新采样
+    """
+    low, high = OBSTACLE_REGION
+    extra = rng.uniform(low, high, size=(len(destination), num_obstacles - 1, 2)).astype(np.float32)
+    while True:
+        to_dest = extra - destination[:, None]
+        too_close = ((extra * extra).sum(axis=2) < OBSTACLE_CLEARANCE ** 2) | \
+                    ((to_dest * to_dest).sum(axis=2) < OBSTACLE_CLEARANCE ** 2)
+        if not too_close.any():
+            break
+        extra[too_close] = rng.uniform(low, high, size=(int(too_close.sum()), 2))
+    return np.concatenate([obs_pos[:, None], extra], axis=1)
+
+
+def egocentric_observation(obs):
+    """
+    原始观察 -> 以ego为中心的观察（float32）：
+    destination - ego (2), obs_pos - ego (2), 到destination的距离, 到障碍物的距离
+    可用于单个 (6,) 或批量 (N, 6) 观察
+    """
+    obs = np.asarray(obs, dtype=np.float32)
+    ego = obs[..., 0:2]
+    to_dest = obs[..., 2:4] - ego
+    to_obs = obs[..., 4:6] - ego
+    dist_to_dest = np.sqrt(to_dest[..., 0:1] * to_dest[..., 0:1] + to_dest[..., 1:2] * to_dest[..., 1:2])
+    dist_to_obs = np.sqrt(to_obs[..., 0:1] * to_obs[..., 0:1] + to_obs[..., 1:2] * to_obs[..., 1:2])
+    return np.concatenate([to_dest, to_obs, dist_to_dest, dist_to_obs], axis=-1)
+
+
+# 观察模式：原始观察 -> 该模式下的观察
+OBS_MODES = {
+    "absolute": lambda obs: np.asarray(obs, dtype=np.float32),
+    "egocentric": egocentric_observation,
+}
+
+
+def _observation_stats(obs_mode, num_samples=100_000, seed=0):
+    """
+    归一化观察用的均值和标准差（float32，形状 (6,)），由场景分布预先计算：
+    destination 和 obs_pos 直接采样，ego位置取原点到destination连线上的均匀位置
+    """
+    rng = np.random.default_rng(seed)
+    destination, obs_pos = sample_scenarios(rng, num_samples)
+    ego = rng.uniform(0, 1, size=(num_samples, 1)) * destination
+    samples = OBS_MODES[obs_mode](np.concatenate([ego, destination, obs_pos], axis=1))
+    return samples.mean(axis=0).astype(np.float32), samples.std(axis=0).astype(np.float32)
+
+
+# 每种观察模式的 (均值, 标准差)
+OBS_STATS = {mode: _observation_stats(mode) for mode in OBS_MODES}
+OBS_MEAN, OBS_STD = OBS_STATS["absolute"]
+
+
+def normalize_observation(obs, obs_mode="absolute"):
+    """obs_mode 模式下的观察 -> 归一化观察（float32），可用于单个 (6,) 或批量 (N, 6) 观察"""
+    mean, std = OBS_STATS[obs_mode]
+    return (np.asarray(obs, dtype=np.float32) - mean) / std
+
+
+def make_observation(raw_obs, obs_mode="absolute", normalize_obs=False):
+    """
+    环境内部的原始观察（ego, destination, obs_pos）-> 策略看到的观察（新数组）
+    单个环境、批量环境和离线工具都用这个函数，保证各处的观察一致
+    """
+    obs = OBS_MODES[obs_mode](raw_obs)
+    if normalize_obs:
+        return normalize_observation(obs, obs_mode)
+    return obs.copy() if obs is raw_obs else obs
+
+
+def observation_space(normalize_obs=False, obs_mode="absolute"):
+    """观察空间：原始坐标在 ±100 范围内，相对向量在 ±200 范围内，距离在 0 到 200√2 之间；归一化后为对应的区间"""
+    if obs_mode == "absolute":
+        low, high = np.full(6, -100.0), np.full(6, 100.0)
+    else:
+        low = np.array([-200.0, -200.0, -200.0, -200.0, 0.0, 0.0])
+        high = np.array([200.0, 200.0, 200.0, 200.0, 200.0 * math.sqrt(2), 200.0 * math.sqrt(2)])
+    if normalize_obs:
+        low, high = normalize_observation(low, obs_mode), normalize_observation(high, obs_mode)
+    return spaces.Box(low=low.astype(np.float32), high=high.astype(np.float32), dtype=np.float32)
+
+
 class DecisionEnv(gym.Env):
     metadata = {"render_modes": []}
 
-    def __init__(self):
+    def __init__(self, scenario_batch_size=1024, instrument=False, max_episode_steps=MAX_EPISODE_STEPS,
+                 scenario_bank=None, normalize_obs=False, obs_mode="absolute", num_obstacles=1):
         # 观察空间：ego位置(2) + destination位置(2) + obs位置(2) = 6维（移除速度）
-        self.observation_space = spaces.Box(
-            low=-100, high=100, shape=(6,), dtype=np.float32
-        )
+        # num_obstacles > 1 时 obs位置为最近的障碍物，碰撞和避障奖励对附近的全部障碍物计算
+        # obs_mode="egocentric" 时为相对ego的目标和障碍物向量及距离（见 egocentric_observation）
+        # normalize_obs=True 时观察按场景分布的均值和标准差归一化（见 normalize_observation）
+        if obs_mode not in OBS_MODES:
+            raise ValueError(f"未知的观察模式: {obs_mode}")
+        self.obs_mode = obs_mode
+        self.normalize_obs = normalize_obs
+        self.observation_space = observation_space(normalize_obs, obs_mode)
+        # 预分配的观察缓冲区，ego_pos / destination / obs_pos 是它的视图，状态更新直接写入观察
+        self._obs_buf = np.zeros(6, dtype=np.float32)
+        self.ego_pos = self._obs_buf[0:2]
+        self.destination = self._obs_buf[2:4]
+        self.obs_pos = self._obs_buf[4:6]
         self.action_space = spaces.Discrete(4)  # 上、下、左、右
         self.step_size = 1.0  # 每次移动的固定距离
+        # episode步数上限，None为不限制
+        self.max_episode_steps = max_episode_steps
+        self._step_limit = math.inf if max_episode_steps is None else max_episode_steps
+        # 每个动作在其坐标轴上的位移
+        self._step_deltas = tuple(
+            np.float32(sign * self.step_size) for sign in ACTION_SIGN
+        )
+        # 预采样的场景表 (destination, obs_pos)，reset时按顺序取用
+        self.scenario_batch_size = scenario_batch_size
+        self._scenarios = (np.empty((0, 2), dtype=np.float32), np.empty((0, 2), dtype=np.float32))
+        self._scenario_idx = 0
+        # 固定场景库（scenario_bank.ScenarioBank），reset(options={"scenario_id": i})时使用
+        self.scenario_bank = scenario_bank
+        # 多障碍物：障碍物保存在网格索引中，step只检查ego附近的障碍物
+        self.num_obstacles = num_obstacles
+        if num_obstacles > 1:
+            if instrument or scenario_bank is not None:
+                raise ValueError("多障碍物环境不支持插桩模式和场景库")
+            self.obstacles = ObstacleGrid(1, num_obstacles, radius=DEFAULT_REWARD_CONFIG["warning_radius"])
+            self.step = self._step_multi_obstacle
+        # 奖励配置（默认配置，与 reward.compute_rewards 相同）
+        self._reward_params = scalar_reward_params()
+        # 插桩模式：逐项记录奖励并累计整步耗时；关闭时 reward_terms 为None，不做任何额外工作
+        self.instrument = instrument
+        self.reward_terms = None
+        if instrument:
+            self.reward_terms = np.zeros(len(REWARD_TERMS), dtype=np.float64)
+            self.reward_term_sums = np.zeros(len(REWARD_TERMS), dtype=np.float64)
+            self.reset_reward_stats()
+            self.step = self._step_instrumented
         self.reset()
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         
         # ego初始位置设为原点
-        self.ego_pos = np.array([0.0, 0.0], dtype=np.float32)
-        
-        # destination目标点：在初始位置前方
-        dest_distance = np.random.uniform(50, 80)
-        dest_angle = np.random.uniform(-0.2, 0.2)  # 目标点稍微偏移
-        self.destination = np.array([
-            dest_distance * np.cos(dest_angle),
-            dest_distance * np.sin(dest_angle)
-        ], dtype=np.float32)
-        
-        # 障碍物位置：在初始位置和destination之间
-        obs_ratio = np.random.uniform(0.3, 0.5)  # 在路径的30%-50%处
-        obs_base_x = obs_ratio * self.destination[0]
-        obs_base_y = obs_ratio * self.destination[1]
+        self.ego_pos[:] = 0.0
+        # destination目标点和障碍物位置从场景表中复制到观察缓冲区
+        if options is not None and "scenario_id" in options:
+            # 指定场景库中的场景
+            if self.scenario_bank is None:
+                raise ValueError("reset(options={'scenario_id': ...}) 需要在构造时传入 scenario_bank")
+            i = options["scenario_id"]
+            self.destination[:] = self.scenario_bank.destination[i]
+            self.obs_pos[:] = self.scenario_bank.obs_pos[i]
+        else:
+            # 场景表用完或重新设置种子时，用self.np_random一次性预采样一批场景
+            if seed is not None or self._scenario_idx >= len(self._scenarios[0]):
+                self._scenarios = sample_scenarios(self.np_random, self.scenario_batch_size)
+                if self.num_obstacles > 1:
+                    self._scenarios += (sample_obstacles(self.np_random, *self._scenarios, self.num_obstacles),)
+                self._scenario_idx = 0
+            i = self._scenario_idx
+            self._scenario_idx += 1
+            self.destination[:] = self._scenarios[0][i]
+            self.obs_pos[:] = self._scenarios[1][i]
+            if self.num_obstacles > 1:
+                self.obstacles.build([0], self._scenarios[2][i:i + 1])
+                # 标量step按单元区间读取障碍物，区间的起始位置转为Python列表
+                self._obstacle_cell_start = self.obstacles.cell_start[0].tolist()
+                self._update_nearest_obstacle()
         
-        # 障碍物横向偏移（在路径两侧）
-        lateral_offset = np.random.uniform(-5, 5)
-        # 计算垂直于路径的方向
-        path_direction = self.destination / (np.linalg.norm(self.destination) + 1e-6)
-        perpendicular = np.array([-path_direction[1], path_direction[0]])
-        self.obs_pos = np.array([
-            obs_base_x + lateral_offset * perpendicular[0],
-            obs_base_y + lateral_offset * perpendicular[1]
-        ], dtype=np.float32)
+        # 奖励用的初始距离：每个episode重新计算，避免沿用上一个episode的几何
+        self.initial_dist_to_dest = _norm2(self.destination[0], self.destination[1])
+        self.last_dist_to_dest = self.initial_dist_to_dest
+        self.elapsed_steps = 0
         
         return self._get_obs(), {}
 
     def _get_obs(self):
-        """返回观察：ego位置、destination位置、obs位置（移除速度）"""
-        return np.concatenate([
-            self.ego_pos,
-            self.destination,
-            self.obs_pos
-        ], dtype=np.float32)
+        """返回观察：ego位置、destination位置、obs位置（移除速度），按 obs_mode / normalize_obs 转换"""
+        return make_observation(self._obs_buf, self.obs_mode, self.normalize_obs)
 
     def step(self, action):
-        reward = -0.01  # 每步小惩罚
-        terminated = False
-        
-        # 动作执行：上下左右平移
+        # 单环境的标量快速路径；奖励见 reward.scalar_reward（向量化版本为 reward.compute_rewards）
+        # 动作执行：上下左右平移（原地更新ego_pos）
         # action: 0=上(y+), 1=下(y-), 2=左(x-), 3=右(x+)
-        if action == 0:      # 上 - 向y正方向移动
-            self.ego_pos += np.array([0.0, self.step_size], dtype=np.float32)
-        elif action == 1:    # 下 - 向y负方向移动
-            self.ego_pos += np.array([0.0, -self.step_size], dtype=np.float32)
-        elif action == 2:    # 左 - 向x负方向移动
-            self.ego_pos += np.array([-self.step_size, 0.0], dtype=np.float32)
-        elif action == 3:    # 右 - 向x正方向移动
-            self.ego_pos += np.array([self.step_size, 0.0], dtype=np.float32)
+        axis = ACTION_AXIS[action]
+        ego_pos = self.ego_pos
+        ego_pos[axis] += self._step_deltas[action]
+        ego_x, ego_y = ego_pos
         
-        # 计算到destination的距离
-        dist_to_dest = np.linalg.norm(self.destination - self.ego_pos)
+        # 到destination和障碍物的向量和距离（标量运算，结果与np.linalg.norm一致）
+        to_dest = (self.destination[0] - ego_x, self.destination[1] - ego_y)
+        dist_to_dest = _norm2(to_dest[0], to_dest[1])
+        to_obs = (self.obs_pos[0] - ego_x, self.obs_pos[1] - ego_y)
+        dist_to_obs = _norm2(to_obs[0], to_obs[1])
         
-        # 计算到障碍物的距离
-        dist_to_obs = np.linalg.norm(self.obs_pos - self.ego_pos)
-        
-        # 奖励设计：基于到终点的距离
-        # 初始距离
-        if not hasattr(self, 'initial_dist_to_dest'):
-            self.initial_dist_to_dest = np.linalg.norm(self.destination)
-            self.last_dist_to_dest = self.initial_dist_to_dest
-        
-        # 1. 进度奖励：基于距离减少（鼓励向目标前进）
-        progress = self.last_dist_to_dest - dist_to_dest
-        progress_reward = progress * 2.0  # 每减少1单位距离，奖励2.0
-        reward += progress_reward
+        # 奖励：基于到终点的距离（初始距离在reset中计算）和障碍物距离
+        reward, arrived, collided = scalar_reward(
+            self._reward_params, axis, ACTION_SIGN[action], to_dest, dist_to_dest, self.last_dist_to_dest,
+            self.initial_dist_to_dest, ((to_obs, dist_to_obs),), self.reward_terms)
         self.last_dist_to_dest = dist_to_dest
+        terminated = arrived or collided
         
-        # 2. 距离奖励：越接近目标，奖励越高（非线性，越近奖励增长越快）
-        normalized_dist = dist_to_dest / (self.initial_dist_to_dest + 1e-6)
-        # 如果超过初始距离，直接给负奖励
-        if normalized_dist > 1.0:
-            distance_reward = -(normalized_dist - 1.0) * 2.0  # 超过部分每单位惩罚2.0
-        else:
-            # 使用平方函数，使得接近目标时奖励增长更快
-            distance_reward = (1.0 - normalized_dist) ** 2 * 1.0
-        reward += distance_reward
-        
-        # 3. 动作奖励：根据距离和动作类型给予不同奖励
-        # 计算到目标的方向，鼓励向目标方向移动
-        to_dest = self.destination - self.ego_pos
-        to_dest_norm = np.linalg.norm(to_dest)
-        if to_dest_norm > 1e-6:
-            to_dest_dir = to_dest / to_dest_norm
-            # 计算动作方向
-            action_dirs = {
-                0: np.array([0.0, 1.0]),   # 上
-                1: np.array([0.0, -1.0]),  # 下
-                2: np.array([-1.0, 0.0]),  # 左
-                3: np.array([1.0, 0.0])    # 右
-            }
-            action_dir = action_dirs[action]
-            # 计算动作方向与目标方向的一致性（点积）
-            direction_alignment = np.dot(action_dir, to_dest_dir)
-            # 如果动作方向朝向目标，给予奖励
-            if direction_alignment > 0:
-                direction_reward = direction_alignment * 0.5  # 最多0.5的奖励
-                reward += direction_reward
-        
-        # 5. 渐进式碰撞警告：距离障碍物越近，惩罚越大（增强版本）
-        if dist_to_obs < 25.0:  # 提前开始警告（从25单位开始）
-            # 距离越近，惩罚越大（增强）
-            obs_penalty = (25.0 - dist_to_obs) / 10.0 * 1.5  # 最多3.75的惩罚
-            reward -= obs_penalty
-        
-        # 5.1 避障动作奖励：当接近障碍物时，强烈鼓励远离障碍物（增强版本）
-        if dist_to_obs < 15.0:  # 距离障碍物15单位内（扩大范围）
-            to_obs = self.obs_pos - self.ego_pos
-            to_obs_norm = np.linalg.norm(to_obs)
-            if to_obs_norm > 1e-6:
-                to_obs_dir = to_obs / to_obs_norm
-                # 计算动作方向
-                action_dirs = {
-                    0: np.array([0.0, 1.0]),   # 上
-                    1: np.array([0.0, -1.0]),  # 下
-                    2: np.array([-1.0, 0.0]),  # 左
-                    3: np.array([1.0, 0.0])    # 右
-                }
-                action_dir = action_dirs[action]
-                # 计算动作方向与远离障碍物方向的一致性（负点积，因为要远离）
-                avoidance_alignment = -np.dot(action_dir, to_obs_dir)
-                # 如果动作方向远离障碍物，给予奖励（增强）
-                if avoidance_alignment > 0:
-                    avoidance_bonus = avoidance_alignment * (15.0 - dist_to_obs) / 15.0 * 2.0  # 最多2.0的奖励
-                    reward += avoidance_bonus
-                # 如果动作方向朝向障碍物，给予惩罚（增强）
-                elif avoidance_alignment < 0:
-                    approach_penalty = -avoidance_alignment * (15.0 - dist_to_obs) / 15.0 * 1.5  # 最多1.5的惩罚
-                    reward -= approach_penalty
-        
-        # 5.2 紧急避障：非常接近障碍物时，强烈鼓励避障
-        if dist_to_obs < 8.0:  # 距离障碍物8单位内（紧急情况）
-            to_obs = self.obs_pos - self.ego_pos
-            to_obs_norm = np.linalg.norm(to_obs)
-            if to_obs_norm > 1e-6:
-                to_obs_dir = to_obs / to_obs_norm
-                action_dirs = {
-                    0: np.array([0.0, 1.0]),   # 上
-                    1: np.array([0.0, -1.0]),  # 下
-                    2: np.array([-1.0, 0.0]),  # 左
-                    3: np.array([1.0, 0.0])    # 右
-                }
-                action_dir = action_dirs[action]
-                avoidance_alignment = -np.dot(action_dir, to_obs_dir)
-                # 紧急情况下，远离障碍物的奖励大幅增强
-                if avoidance_alignment > 0:
-                    emergency_bonus = avoidance_alignment * (8.0 - dist_to_obs) / 8.0 * 3.0  # 最多3.0的奖励
-                    reward += emergency_bonus
-                # 紧急情况下，朝向障碍物的惩罚大幅增强
-                elif avoidance_alignment < 0:
-                    emergency_penalty = -avoidance_alignment * (8.0 - dist_to_obs) / 8.0 * 2.5  # 最多2.5的惩罚
-                    reward -= emergency_penalty
-        
-        # 6. 到达目标（大幅奖励）
-        if dist_to_dest < 8.0:  # 增大到达阈值
-            reward += 100.0  # 到达奖励
-            terminated = True
-        
-        # 7. 碰撞障碍物（大幅惩罚，增强以避免碰撞）
-        if dist_to_obs < 2.0:
-            reward -= 200.0  # 碰撞惩罚（增强，从160增加到200）
-            terminated = True
+        # 8. 步数上限：未终止时截断
+        self.elapsed_steps += 1
+        truncated = not terminated and self.elapsed_steps >= self._step_limit
         
-        return self._get_obs(), reward, terminated, False, {}
+        # 奖励舍入到float32（与SB3缓冲区和批量环境的奖励一致），以Python float返回（Gymnasium/SB3的接口要求）
+        return self._get_obs(), float(np.float32(reward)), terminated, truncated, {}
+
+    def _step_multi_obstacle(self, action):
+        """
+        多障碍物版step：奖励同样由 reward.scalar_reward 计算，障碍物各项对网格索引中ego附近的每个障碍物分别计算后相加，
+        碰撞任意一个障碍物即终止；obs_pos 更新为最近的障碍物
+        """
+        axis = ACTION_AXIS[action]
+        ego_pos = self.ego_pos
+        ego_pos[axis] += self._step_deltas[action]
+        ego_x, ego_y = ego_pos
+
+        to_dest = (self.destination[0] - ego_x, self.destination[1] - ego_y)
+        dist_to_dest = _norm2(to_dest[0], to_dest[1])
+
+        # 查询半径（警告半径）内的障碍物，与批量环境的 ObstacleGrid.query 相同：相邻单元的障碍物按列为连续的几段，
+        # 候选较少时逐个检查，较多时合并后用一个距离掩码筛选（附近的障碍物也较多时各项一次计算，见 reward.obstacle_sums）
+        cell_start = self._obstacle_cell_start
+        segments = [(cell_start[lo], cell_start[hi]) for lo, hi in self.obstacles.point_ranges(ego_x, ego_y)]
+        radius = self.obstacles.radius
+        nearby, totals = [], None
+        nearest, nearest_dist = None, math.inf
+        positions = self.obstacles.positions[0]
+        if sum(end - start for start, end in segments) <= VECTORIZED_OBSTACLES:
+            for start, end in segments:
+                for obs_x, obs_y in positions[start:end].tolist():
+                    to_obs = (obs_x - ego_x, obs_y - ego_y)
+                    dist_to_obs = _norm2(to_obs[0], to_obs[1])
+                    if dist_to_obs <= radius:
+                        nearby.append((to_obs, dist_to_obs))
+                        if dist_to_obs < nearest_dist:
+                            nearest, nearest_dist = (obs_x, obs_y), dist_to_obs
+        else:
+            candidates = np.concatenate([positions[start:end] for start, end in segments])
+            to_obs = candidates - ego_pos
+            dist_to_obs = np.sqrt(to_obs[:, 0] * to_obs[:, 0] + to_obs[:, 1] * to_obs[:, 1])
+            in_range = np.flatnonzero(dist_to_obs <= radius)
+            if len(in_range) > VECTORIZED_OBSTACLES:
+                totals = obstacle_sums(self._reward_params, axis, ACTION_SIGN[action], to_obs[in_range],
+                                       dist_to_obs[in_range])
+            else:
+                nearby = list(zip(to_obs[in_range], dist_to_obs[in_range]))
+            if len(in_range):
+                nearest = candidates[in_range[np.argmin(dist_to_obs[in_range])]]
+
+        # obs_pos 为最近的障碍物；查询半径内没有障碍物时逐圈扩大范围查找，
+        # 上次查找时的最近障碍物在此后的移动中不可能被其他障碍物超过时（_nearest_slack > 0）直接沿用
+        if nearest is not None:
+            self.obs_pos[:] = nearest
+            self._nearest_slack = 0.0
+        else:
+            self._nearest_slack -= 2 * self.step_size
+            if self._nearest_slack <= 0:
+                self._update_nearest_obstacle()
+
+        reward, arrived, collided = scalar_reward(
+            self._reward_params, axis, ACTION_SIGN[action], to_dest, dist_to_dest, self.last_dist_to_dest,
+            self.initial_dist_to_dest, nearby, obstacle_totals=totals)
+        self.last_dist_to_dest = dist_to_dest
+        terminated = arrived or collided
+        self.elapsed_steps += 1
+        truncated = not terminated and self.elapsed_steps >= self._step_limit
+        return self._get_obs(), float(np.float32(reward)), terminated, truncated, {}
+
+    def _update_nearest_obstacle(self):
+        """
+        多障碍物时在网格中查找离ego最近的障碍物写入 obs_pos，并记录它领先其余障碍物的距离：
+        每步ego移动 step_size，领先距离最多减少 2 * step_size，仍为正时最近的障碍物不变
+        """
+        ego_x, ego_y = self.ego_pos
+        nearest, runner_up = self.obstacles.point_nearest(ego_x, ego_y, cell_start=self._obstacle_cell_start)
+        self.obs_pos[:] = nearest
+        self._nearest_slack = runner_up - _norm2(nearest[0] - ego_x, nearest[1] - ego_y)
+
+    def reset_reward_stats(self):
+        """清零插桩模式下累计的奖励数值、耗时和步数"""
+        self.reward_term_sums[:] = 0.0
+        self.step_time_ns = 0
+        self.instrumented_steps = 0
+
+    def reward_stats(self):
+        """
+        插桩模式下的累计统计：
+        reward_term_sums 为各项奖励之和（按 REWARD_TERMS 顺序的数组），step_time_ns 为 step 的总耗时（纳秒）
+        """
+        return {
+            "reward_term_sums": self.reward_term_sums.copy(),
+            "step_time_ns": self.step_time_ns,
+            "steps": self.instrumented_steps,
+        }
+
+    def _step_instrumented(self, action):
+        """
+        插桩版step：执行 step 本身（奖励与之逐位相同），奖励各项由 scalar_reward 写入预分配的 self.reward_terms
+        并累计到 self.reward_term_sums；只对整步计时（单项的耗时远小于计时函数本身的开销，各项的耗时见 benchmark.py）
+        info 中为本步各项、到目前为止的累计值、累计步数和整步总耗时（数组都是副本，可以跨步保存）
+        """
+        self.reward_terms[:] = 0.0
+        start = time.perf_counter_ns()
+        obs, reward, terminated, truncated, info = DecisionEnv.step(self, action)
+        self.step_time_ns += time.perf_counter_ns() - start
+        self.reward_term_sums += self.reward_terms
+        self.instrumented_steps += 1
+        info["reward_terms"] = self.reward_terms.copy()
+        info["reward_term_sums"] = self.reward_term_sums.copy()
+        info["instrumented_steps"] = self.instrumented_steps
+        info["step_time_ns"] = self.step_time_ns
+        return obs, reward, terminated, truncated, info
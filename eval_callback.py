@@ -0,0 +1,141 @@
+"""
+训练中的异步评估
+每隔 eval_freq 步复制一次actor权重，在独立进程中用 NumpyPolicy 在固定场景库上批量评估，
+训练循环不等待评估结果；结果到达后写入SB3日志，并保存表现最好的快照
+"""
+import multiprocessing as mp
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from numpy_policy import NumpyPolicy, policy_arrays
+from scenario_bank import generate_bank
+
+# 评估进程中的场景库（进程启动时设置一次）
+_eval_bank = None
+
+
+def _init_eval_worker(bank):
+    global _eval_bank
+    _eval_bank = bank
+
+
+def _evaluate_snapshot(arrays, num_envs):
+    """评估进程：在场景库上运行一次完整评估（观察配置保存在快照中），返回各结果的比例和平均奖励"""
+    from rollout import run_episodes, SUCCESS, COLLISION, TIMEOUT
+
+    result = run_episodes(NumpyPolicy.from_arrays(arrays), scenario_bank=_eval_bank, num_envs=num_envs)
+    counts = np.bincount(result.outcome, minlength=3)
+    return {
+        "success_rate": counts[SUCCESS] / result.num_episodes,
+        "collision_rate": counts[COLLISION] / result.num_episodes,
+        "timeout_rate": counts[TIMEOUT] / result.num_episodes,
+        "mean_reward": float(np.mean(result.total_reward)),
+        "mean_length": float(np.mean(result.length)),
+    }
+
+
+class AsyncEvalCallback(BaseCallback):
+    """
+    异步评估回调
+
+    :param eval_freq: 每隔多少环境步评估一次
+    :param eval_episodes: 场景库大小（每次评估都在同一组场景上运行）
+    :param eval_seed: 场景库的随机种子
+    :param best_model_path: 最好快照的保存路径（.npz，可用 numpy_policy.load_policy 读取），None为不保存
+    :param stop_success_rate: 成功率达到该值时停止训练，None为不停止
+    :param patience: 连续多少次评估没有提升时停止训练，None为不停止
+    :param num_envs: 评估时的并行环境数
+    :param normalize_obs: 策略是否使用归一化观察
+    :param obs_mode: 策略使用的观察模式
+
+    上一次评估还没完成时跳过本次快照，评估进程不会积压
+    评估进程在训练结束时关闭；训练中途出错时调用 close()（train.train 在 finally 中调用），
+    未调用时回调被回收或解释器退出时关闭
+    """
+
+    def __init__(self, eval_freq=10_000, eval_episodes=1000, eval_seed=0, best_model_path="best_model.npz",
+                 stop_success_rate=None, patience=None, num_envs=1024, normalize_obs=False,
+                 obs_mode="absolute", verbose=0):
+        super().__init__(verbose)
+        self.eval_freq = eval_freq
+        self.eval_episodes = eval_episodes
+        self.eval_seed = eval_seed
+        self.best_model_path = best_model_path
+        self.stop_success_rate = stop_success_rate
+        self.patience = patience
+        self.num_envs = num_envs
+        self.normalize_obs = normalize_obs
+        self.obs_mode = obs_mode
+        self.results = []           # (快照时的步数, 评估结果)
+        self.best_success_rate = -np.inf
+        self.best_mean_reward = -np.inf
+        self._evals_since_best = 0
+        self._pool = None
+        self._pending = None        # (步数, 权重, future)
+        self._last_eval_step = 0
+        self._stop = False
+
+    def _init_callback(self):
+        bank = generate_bank(self.eval_episodes, seed=self.eval_seed)
+        self._pool = ProcessPoolExecutor(
+            1, mp_context=mp.get_context("spawn"), initializer=_init_eval_worker, initargs=(bank,)
+        )
+        self._finalizer = weakref.finalize(self, self._pool.shutdown, wait=False, cancel_futures=True)
+
+    def close(self):
+        """关闭评估进程，放弃未完成的评估（可重复调用）"""
+        self._pending = None
+        if self._pool is not None:
+            self._finalizer()
+            self._pool = None
+
+    def _collect(self):
+        """处理已完成的评估：记录日志、保存最好的快照、判断是否提前停止"""
+        step, arrays, future = self._pending
+        self._pending = None
+        metrics = future.result()
+        self.results.append((step, metrics))
+        for name, value in metrics.items():
+            self.logger.record(f"eval/{name}", value)
+        self.logger.record("eval/snapshot_timesteps", step)
+
+        # 先比较成功率，成功率相同时比较平均奖励
+        score = (metrics["success_rate"], metrics["mean_reward"])
+        if score > (self.best_success_rate, self.best_mean_reward):
+            self.best_success_rate, self.best_mean_reward = score
+            self._evals_since_best = 0
+            if self.best_model_path is not None:
+                np.savez(self.best_model_path, **arrays)
+        else:
+            self._evals_since_best += 1
+        if self.verbose > 0:
+            print(f"Eval @ {step} steps: success={metrics['success_rate']:.3f} "
+                  f"collision={metrics['collision_rate']:.3f} timeout={metrics['timeout_rate']:.3f} "
+                  f"reward={metrics['mean_reward']:.2f}")
+
+        if self.stop_success_rate is not None and metrics["success_rate"] >= self.stop_success_rate:
+            self._stop = True
+        if self.patience is not None and self._evals_since_best >= self.patience:
+            self._stop = True
+
+    def _on_step(self):
+        if self._pending is not None and self._pending[2].done():
+            self._collect()
+        if self.num_timesteps - self._last_eval_step >= self.eval_freq and self._pending is None:
+            self._last_eval_step = self.num_timesteps
+            arrays = policy_arrays(self.model.policy, self.obs_mode, self.normalize_obs)
+            future = self._pool.submit(_evaluate_snapshot, arrays, self.num_envs)
+            self._pending = (self.num_timesteps, arrays, future)
+        return not self._stop
+
+    def _on_training_end(self):
+        # 等待最后一次评估，保证结果和最好快照完整；评估出错时也关闭进程
+        try:
+            if self._pending is not None:
+                self._collect()
+        finally:
+            self._pool.shutdown()
+            self.close()
@@ -1,21 +1,24 @@
 """
 评估训练好的模型性能
 """
-from stable_baselines3 import PPO
+import itertools
+
 from env import DecisionEnv
+from numpy_policy import load_policy, observation_config
+from rollout import run_episodes, SUCCESS, COLLISION, TIMEOUT
 import numpy as np
 
-def evaluate_model(num_episodes=20, verbose=True):
-    """评估模型性能"""
-    env = DecisionEnv()
-    model = PPO.load("ppo_decision")
-    
-    # 统计指标
-    episode_rewards = []
-    episode_lengths = []
-    success_count = 0  # 成功到达目标
-    collision_count = 0  # 碰撞障碍物
-    timeout_count = 0  # 超时（达到最大步数）
+def evaluate_model(num_episodes=20, verbose=True, num_envs=256, seed=None, policy_path="ppo_decision",
+                   rollout_result=None, scenario_bank=None):
+    """
+    评估模型性能（多个环境并行，每步一次批量推理）
+    rollout_result: 已有的 RolloutResult，传入时直接读取，不再重新运行
+    scenario_bank: 固定场景库，传入时在场景库的前 num_episodes 个场景上评估（None 为整个场景库）
+    """
+    if rollout_result is None:
+        rollout_result = run_episodes(load_policy(policy_path), num_episodes, num_envs=num_envs, seed=seed,
+                                      scenario_bank=scenario_bank)
+    num_episodes = rollout_result.num_episodes
     
     action_names = {0: "up", 1: "down", 2: "left", 3: "right"}
     
@@ -24,48 +27,24 @@ def evaluate_model(num_episodes=20, verbose=True):
     print("=" * 70)
     print(f"评估 {num_episodes} 个 episodes...\n")
     
-    for episode in range(num_episodes):
-        obs, _ = env.reset()
-        total_reward = 0
-        steps = 0
-        episode_actions = []
-        
-        while steps < 200:  # 增加最大步数
-            action, _ = model.predict(obs, deterministic=True)
-            action = int(action)  # 确保是标量
-            obs, reward, done, truncated, _ = env.step(action)
-            
-            total_reward += reward
-            steps += 1
-            episode_actions.append(action_names[action])
-            
-            if done or truncated:
-                break
-        
-        episode_rewards.append(total_reward)
-        episode_lengths.append(steps)
-        
-        # 计算最终距离
-        dist_to_dest = np.linalg.norm(env.destination - env.ego_pos)
-        dist_to_obs = np.linalg.norm(env.obs_pos - env.ego_pos)
-        
-        # 判断episode结果
-        if dist_to_obs < 2.0:
-            collision_count += 1
-            result = "❌ 碰撞"
-        elif dist_to_dest < 8.0:  # 更新到达阈值
-            success_count += 1
-            result = "✅ 成功"
-        else:
-            timeout_count += 1
-            result = "⏱️  超时"
-        
-        if verbose:
-            print(f"Episode {episode + 1:2d}: {result:8s} | "
-                  f"奖励: {total_reward:6.2f} | "
-                  f"步数: {steps:3d} | "
-                  f"到目标: {dist_to_dest:5.2f}")
-            if verbose and episode < 3:  # 只显示前3个episode的详细动作序列
+    episode_rewards = rollout_result.total_reward
+    episode_lengths = rollout_result.length
+    outcomes = rollout_result.outcome
+    
+    # 统计指标
+    success_count = int(np.sum(outcomes == SUCCESS))  # 成功到达目标
+    collision_count = int(np.sum(outcomes == COLLISION))  # 碰撞障碍物
+    timeout_count = int(np.sum(outcomes == TIMEOUT))  # 超时（达到最大步数）
+    
+    if verbose:
+        result_labels = {SUCCESS: "✅ 成功", COLLISION: "❌ 碰撞", TIMEOUT: "⏱️  超时"}
+        for episode in range(num_episodes):
+            print(f"Episode {episode + 1:2d}: {result_labels[outcomes[episode]]:8s} | "
+                  f"奖励: {episode_rewards[episode]:6.2f} | "
+                  f"步数: {episode_lengths[episode]:3d} | "
+                  f"到目标: {rollout_result.final_dist[episode]:5.2f}")
+            if episode < 3:  # 只显示前3个episode的详细动作序列
+                episode_actions = [action_names[a] for a in rollout_result.episode_actions(episode)]
                 print(f"  动作序列: {' -> '.join(episode_actions[:15])}")
                 if len(episode_actions) > 15:
                     print(f"            ... (共{len(episode_actions)}步)")
@@ -117,8 +96,9 @@ if __name__ == "__main__":
     print("\n" + "=" * 70)
     print("详细演示 - 单个Episode")
     print("=" * 70)
-    env = DecisionEnv()
-    model = PPO.load("ppo_decision")
+    model = load_policy("ppo_decision")
+    obs_mode, normalize_obs = observation_config(model)
+    env = DecisionEnv(obs_mode=obs_mode, normalize_obs=normalize_obs)
     
     obs, _ = env.reset(seed=42)
     action_names = {0: "up", 1: "down", 2: "left", 3: "right"}
@@ -129,7 +109,8 @@ if __name__ == "__main__":
     print("-" * 80)
     
     total_reward = 0
-    for step in range(200):
+    # 步数上限由环境处理（达到 max_episode_steps 时 truncated 为True）
+    for step in itertools.count():
         action, _ = model.predict(obs, deterministic=True)
         action = int(action)  # 确保是标量
         obs, reward, done, truncated, _ = env.step(action)
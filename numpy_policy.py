@@ -0,0 +1,158 @@
+"""
+纯NumPy策略推理
+把 ppo_decision.zip 中 MlpPolicy 的 actor 权重导出为 .npz，
+推理时只需要NumPy，不需要导入torch和SB3
+
+导出: python numpy_policy.py [ppo_decision] [ppo_decision.npz]
+"""
+import os
+import sys
+
+import numpy as np
+
+# 支持的激活函数（与torch.nn中的类名对应）
+_ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "ReLU": lambda x: np.maximum(x, 0.0),
+}
+
+
+def observation_config(policy):
+    """
+    策略训练时使用的观察 (obs_mode, normalize_obs)：train.py 保存的PPO模型和导出的 NumpyPolicy 带有这两个属性，
+    没有时（旧的检查点、规则专家等）为原始的绝对坐标观察
+    """
+    return getattr(policy, "obs_mode", "absolute"), bool(getattr(policy, "normalize_obs", False))
+
+
+def policy_arrays(policy, obs_mode="absolute", normalize_obs=False):
+    """
+    把SB3 ActorCriticPolicy 的actor网络（policy_net + action_net）复制为NumPy数组字典
+    obs_mode, normalize_obs: 策略使用的观察，一并保存，加载后 run_episodes 按此转换观察
+    """
+    import torch.nn as nn
+
+    arrays = {}
+    activations = []
+    layer = 0
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, nn.Linear):
+            arrays[f"weight_{layer}"] = module.weight.detach().cpu().numpy().T.astype(np.float32)
+            arrays[f"bias_{layer}"] = module.bias.detach().cpu().numpy().astype(np.float32)
+            layer += 1
+        elif type(module).__name__ in _ACTIVATIONS:
+            activations.append(type(module).__name__)
+        else:
+            raise ValueError(f"不支持的层: {module}")
+    arrays[f"weight_{layer}"] = policy.action_net.weight.detach().cpu().numpy().T.astype(np.float32)
+    arrays[f"bias_{layer}"] = policy.action_net.bias.detach().cpu().numpy().astype(np.float32)
+    arrays["activations"] = np.array(activations)
+    arrays["obs_mode"] = np.array(obs_mode)
+    arrays["normalize_obs"] = np.array(normalize_obs)
+    return arrays
+
+
+def export_policy(model_path="ppo_decision", out_path="ppo_decision.npz"):
+    """从SB3模型中导出actor网络的权重"""
+    from stable_baselines3 import PPO
+
+    model = PPO.load(model_path, device="cpu")
+    np.savez(out_path, **policy_arrays(model.policy, *observation_config(model)))
+    return out_path
+
+
+class NumpyPolicy:
+    """
+    NumPy版actor网络，predict接口与SB3一致
+    确定性动作为logits的argmax，与SB3的确定性动作相同
+    obs_mode, normalize_obs: 策略使用的观察（见 observation_config），predict 的输入需是转换后的观察
+    """
+
+    def __init__(self, weights, biases, activations, seed=None, obs_mode="absolute", normalize_obs=False):
+        self.weights = weights
+        self.biases = biases
+        self.activations = [_ACTIVATIONS[name] for name in activations]
+        self.obs_mode = obs_mode
+        self.normalize_obs = normalize_obs
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_arrays(cls, arrays, seed=None):
+        """由 policy_arrays 的结果（或读取的 .npz）构造；没有观察配置的旧文件为绝对坐标观察"""
+        num_layers = len([k for k in arrays if k.startswith("weight_")])
+        weights = [arrays[f"weight_{i}"] for i in range(num_layers)]
+        biases = [arrays[f"bias_{i}"] for i in range(num_layers)]
+        return cls(weights, biases, [str(a) for a in arrays["activations"]], seed=seed,
+                   obs_mode=str(arrays.get("obs_mode", "absolute")),
+                   normalize_obs=bool(arrays.get("normalize_obs", False)))
+
+    @classmethod
+    def load(cls, path="ppo_decision.npz", seed=None):
+        with np.load(path) as data:
+            return cls.from_arrays({k: data[k] for k in data.files}, seed=seed)
+
+    def logits(self, obs):
+        """obs: (N, 6) -> (N, 4) 动作logits"""
+        x = np.asarray(obs, dtype=np.float32)
+        for w, b, act in zip(self.weights, self.biases, self.activations):
+            x = act(x @ w + b)
+        return x @ self.weights[-1] + self.biases[-1]
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=False):
+        """与 SB3 BasePolicy.predict 相同：单个观察返回标量动作，批量观察返回 (N,) 动作"""
+        obs = np.asarray(observation, dtype=np.float32)
+        single = obs.ndim == 1
+        logits = self.logits(obs.reshape(-1, obs.shape[-1]))
+        if deterministic:
+            actions = np.argmax(logits, axis=1)
+        else:
+            # 按softmax概率采样（Gumbel-max）
+            gumbel = -np.log(-np.log(self._rng.random(logits.shape)))
+            actions = np.argmax(logits + gumbel, axis=1)
+        if single:
+            actions = actions.squeeze(axis=0)
+        return actions, state
+
+
+# 已加载的策略：(绝对路径, 修改时间) -> 策略
+_policy_cache = {}
+
+
+def _checkpoint_file(path):
+    """实际的检查点文件（PPO.load 会给不带后缀的路径加上 .zip）"""
+    path = str(path)
+    if not os.path.exists(path) and os.path.exists(path + ".zip"):
+        path += ".zip"
+    return os.path.abspath(path)
+
+
+def load_policy(path="ppo_decision", cache=True):
+    """
+    .npz文件用NumpyPolicy加载（不导入torch），否则用PPO.load加载
+    cache=True 时同一进程中相同路径和修改时间的检查点只加载一次，文件被覆盖后重新加载
+    """
+    file_path = _checkpoint_file(path)
+    key = (file_path, os.stat(file_path).st_mtime_ns)
+    if cache and key in _policy_cache:
+        return _policy_cache[key]
+    if file_path.endswith(".npz"):
+        policy = NumpyPolicy.load(file_path)
+    else:
+        from stable_baselines3 import PPO
+        policy = PPO.load(file_path)
+    if cache:
+        # 同一路径的旧版本不再使用
+        for old_key in [k for k in _policy_cache if k[0] == file_path]:
+            del _policy_cache[old_key]
+        _policy_cache[key] = policy
+    return policy
+
+
+def clear_policy_cache():
+    _policy_cache.clear()
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "ppo_decision"
+    out_path = sys.argv[2] if len(sys.argv) > 2 else "ppo_decision.npz"
+    print(f"Policy exported to: {export_policy(model_path, out_path)}")
@@ -0,0 +1,247 @@
+"""
+障碍物的均匀网格索引（纯NumPy）
+N 组障碍物（每个环境一组，每组 K 个）按所在网格单元排序保存；查询时只检查覆盖查询半径（避障奖励的25单位警告半径）
+的相邻单元中的障碍物，每步的计算量取决于附近障碍物的密度，而不是障碍物总数；
+附近没有障碍物时按圈扩大范围查找最近的障碍物，同样不检查全部障碍物
+"""
+import math
+
+import numpy as np
+
+
+class ObstacleGrid:
+    """
+    多组障碍物的网格索引
+
+    :param num_groups: 组数（环境数）
+    :param num_obstacles: 每组的障碍物数
+    :param radius: 查询半径
+    :param cell_size: 网格单元边长；单元越小，相邻单元覆盖的范围越接近查询圆，但要检查的单元越多
+    :param bound: 网格覆盖 [-bound, bound] 的正方形区域，障碍物需在该范围内
+    """
+
+    def __init__(self, num_groups, num_obstacles, radius=25.0, cell_size=12.5, bound=100.0):
+        self.num_groups = num_groups
+        self.num_obstacles = num_obstacles
+        self.radius = np.float32(radius)
+        self.cell_size = np.float32(cell_size)
+        self.bound = np.float32(bound)
+        self.side = int(np.ceil(2 * bound / cell_size))
+        # 查询点所在单元周围 reach 圈的单元覆盖查询半径
+        reach = int(np.ceil(radius / cell_size))
+        self._reach = reach
+        self._neighbor_dx = np.repeat(np.arange(-reach, reach + 1), 2 * reach + 1)
+        self._neighbor_dy = np.tile(np.arange(-reach, reach + 1), 2 * reach + 1)
+        num_cells = self.side * self.side
+        # 每组的障碍物按单元编号排序；组 g 中单元 c 的障碍物为 positions[g, cell_start[g, c]:cell_start[g, c + 1]]
+        self.positions = np.zeros((num_groups, num_obstacles, 2), dtype=np.float32)
+        self.cell_start = np.zeros((num_groups, num_cells + 1), dtype=np.int64)
+        # 每组各单元障碍物数的二维前缀和：count_table[g, i, j] 为 x 编号 < i、y 编号 < j 的单元中的障碍物数
+        self.count_table = np.zeros((num_groups, self.side + 1, self.side + 1), dtype=np.int64)
+        # 标量查询用：网格外扩 reach 圈后，每个单元的相邻单元按列合并的单元编号区间（见 _square_ranges）
+        self._neighbor_ranges = [
+            self._square_ranges(cx, cy, reach)
+            for cx in range(-reach, self.side + reach) for cy in range(-reach, self.side + reach)
+        ]
+
+    def _square_ranges(self, cx, cy, r):
+        """
+        单元 (cx, cy) 周围 r 圈（正方形，截断到网格内）的单元，每列一个 [起始单元, 结束单元) 编号区间：
+        同一列中相邻的单元编号连续，区间内的障碍物在排序后的 positions 中也是连续的一段
+        """
+        lo_y, hi_y = max(cy - r, 0), min(cy + r, self.side - 1)
+        if lo_y > hi_y:
+            return []
+        return [(nx * self.side + lo_y, nx * self.side + hi_y + 1)
+                for nx in range(max(cx - r, 0), min(cx + r, self.side - 1) + 1)]
+
+    def _cells(self, points):
+        """点所在单元的 (x, y) 编号（不截断，范围外的点编号也在范围外）"""
+        return np.floor((points + self.bound) / self.cell_size).astype(np.int64)
+
+    @staticmethod
+    def _ring_offsets(r):
+        """与中心单元的切比雪夫距离恰好为 r 的单元的 (dx, dy)"""
+        if r == 0:
+            return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+        side = np.arange(-r, r + 1)
+        inner = side[1:-1]
+        dx = np.concatenate([np.full(2 * r + 1, -r), np.full(2 * r + 1, r), inner, inner])
+        dy = np.concatenate([side, side, np.full(2 * r - 1, -r), np.full(2 * r - 1, r)])
+        return dx, dy
+
+    def _gather(self, cells, groups, dx, dy):
+        """
+        cells[i] 偏移 (dx, dy) 后的各单元（范围外的跳过）在组 groups[i] 中的全部障碍物
+        返回 (rows, positions)：每个障碍物对应的查询点编号（按编号排列）和障碍物位置
+        """
+        nx = cells[:, 0:1] + dx
+        ny = cells[:, 1:2] + dy
+        valid = (nx >= 0) & (nx < self.side) & (ny >= 0) & (ny < self.side)
+        cell = np.where(valid, nx * self.side + ny, 0)
+        start = self.cell_start[groups[:, None], cell]
+        lengths = np.where(valid, self.cell_start[groups[:, None], cell + 1] - start, 0).ravel()
+
+        # 把每个单元的 [start, start + length) 展开为障碍物下标
+        rows = np.repeat(np.repeat(np.arange(len(cells)), len(dx)), lengths)
+        range_offsets = np.cumsum(lengths) - lengths
+        local = np.repeat(start.ravel() - range_offsets, lengths) + np.arange(lengths.sum())
+        return rows, self.positions[groups[rows], local]
+
+    def build(self, idx, positions):
+        """重建 idx 中各组的索引，positions 形状为 (len(idx), num_obstacles, 2)"""
+        positions = np.asarray(positions, dtype=np.float32)
+        num_cells = self.side * self.side
+        cells = np.clip(self._cells(positions), 0, self.side - 1)
+        cell = cells[..., 0] * self.side + cells[..., 1]
+        order = np.argsort(cell, axis=1, kind="stable")
+        self.positions[idx] = np.take_along_axis(positions, order[..., None], axis=1)
+        # 每组各单元的障碍物数，累加得到起始位置
+        rows = np.repeat(np.arange(len(positions)), self.num_obstacles)
+        counts = np.bincount(rows * num_cells + cell.ravel(), minlength=len(positions) * num_cells)
+        counts = counts.reshape(len(positions), num_cells)
+        self.cell_start[idx, 1:] = np.cumsum(counts, axis=1)
+        self.count_table[idx, 1:, 1:] = counts.reshape(-1, self.side, self.side).cumsum(axis=1).cumsum(axis=2)
+
+    def query(self, points, idx=None):
+        """
+        半径内的障碍物：points[i] 在组 idx[i]（idx 为None时为组 i）中距离不超过 radius 的全部障碍物
+        返回 (rows, positions)：每个障碍物对应的查询点编号 (M,) 和障碍物位置 (M, 2)
+        """
+        points = np.asarray(points, dtype=np.float32)
+        groups = np.arange(self.num_groups) if idx is None else np.asarray(idx)
+        rows, positions = self._gather(self._cells(points), groups, self._neighbor_dx, self._neighbor_dy)
+
+        # 相邻单元覆盖的是正方形，去掉半径外的
+        offset = positions - points[rows]
+        in_range = offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1] <= self.radius * self.radius
+        return rows[in_range], positions[in_range]
+
+    def point_ranges(self, x, y):
+        """
+        单个点（标量）的相邻单元（覆盖查询半径），按列合并为 [起始单元, 结束单元) 编号区间，
+        组 g 中区间 (lo, hi) 的障碍物为 positions[g, cell_start[g, lo]:cell_start[g, hi]]，供单个环境批量读取；
+        网格外的点截断到外扩的 reach 圈上（候选只会更多，不会遗漏）；半径外的障碍物由调用方去掉
+        """
+        reach = self._reach
+        cx = min(max(math.floor((x + self.bound) / self.cell_size), -reach), self.side + reach - 1)
+        cy = min(max(math.floor((y + self.bound) / self.cell_size), -reach), self.side + reach - 1)
+        return self._neighbor_ranges[(cx + reach) * (self.side + 2 * reach) + cy + reach]
+
+    def point_nearest(self, x, y, group=0, cell_start=None):
+        """
+        单个点（标量）在组 group 中最近的障碍物（查询半径内没有障碍物时使用）：
+        按 count_table 二分查找包含障碍物的最小 r 圈正方形，再检查到其中最近障碍物距离以内的全部单元
+        cell_start: cell_start[group] 的Python列表（标量调用方已转换时传入，逐个读取比NumPy数组快）
+        返回 (最近的障碍物位置, 其余障碍物距离的下界)，调用方可据此判断移动后最近的障碍物是否可能改变
+        """
+        if cell_start is None:
+            cell_start = self.cell_start[group]
+        cx = min(max(math.floor((x + self.bound) / self.cell_size), 0), self.side - 1)
+        cy = min(max(math.floor((y + self.bound) / self.cell_size), 0), self.side - 1)
+        table = self.count_table[group]
+
+        def square_count(r):
+            x0, x1 = max(cx - r, 0), min(cx + r + 1, self.side)
+            y0, y1 = max(cy - r, 0), min(cy + r + 1, self.side)
+            return table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+
+        lo, hi = 0, self.side - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if square_count(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        point = np.array([x, y], dtype=np.float32)
+        r = lo
+        candidates, dist2 = self._square_candidates(point, cx, cy, r, group, cell_start)
+        # 点在所在单元内，r + 1 圈及更外的单元至少相距 r 个单元边长
+        outer = math.ceil(math.sqrt(dist2.min()) / self.cell_size)
+        if outer > r:
+            r = outer
+            candidates, dist2 = self._square_candidates(point, cx, cy, r, group, cell_start)
+        # 其余障碍物距离的下界：正方形中有多个障碍物时为第二近的距离（正方形外还有障碍物时，它们至少相距 r 个单元边长），
+        # 否则按 count_table 找到包含第二个障碍物的最小正方形 r2，其余障碍物都在 r2 圈上或更外，至少相距 r2 - 1 个边长
+        if len(dist2) > 1:
+            runner_up = math.sqrt(np.partition(dist2, 1)[1])
+            if len(dist2) < table[-1, -1]:
+                runner_up = min(runner_up, r * self.cell_size)
+        elif table[-1, -1] > 1:
+            lo, hi = r + 1, self.side - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if square_count(mid) > 1:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            runner_up = (lo - 1) * self.cell_size
+        else:
+            runner_up = math.inf
+        return candidates[np.argmin(dist2)], runner_up
+
+    def _square_candidates(self, point, cx, cy, r, group, cell_start):
+        """单元 (cx, cy) 周围 r 圈正方形中组 group 的障碍物及其到 point 的距离平方"""
+        segments = [(cell_start[lo], cell_start[hi]) for lo, hi in self._square_ranges(cx, cy, r)]
+        positions = self.positions[group]
+        candidates = np.concatenate([positions[start:end] for start, end in segments if start < end])
+        offset = candidates - point
+        return candidates, offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1]
+
+    def nearest(self, points, idx=None, candidates=None):
+        """
+        每个查询点在对应组中最近的障碍物 (len(points), 2)
+        半径内有障碍物时只检查这些障碍物（candidates 为 query 的结果，None时重新查询），
+        否则逐圈扩大检查范围（只在附近没有障碍物时发生，见 _ring_nearest）
+        """
+        points = np.asarray(points, dtype=np.float32)
+        groups = np.arange(self.num_groups) if idx is None else np.asarray(idx)
+        rows, positions = self.query(points, idx) if candidates is None else candidates
+        found, _, result = self._segment_nearest(points, rows, positions)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            result[missing] = self._ring_nearest(points[missing], groups[missing])
+        return result
+
+    @staticmethod
+    def _segment_nearest(points, rows, positions):
+        """
+        按查询点编号排列的候选障碍物中每个点最近的一个
+        返回 (是否有候选, 最小距离平方（没有候选时为inf）, 最近的障碍物位置)
+        """
+        offset = positions - points[rows]
+        dist2 = offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1]
+
+        # 每段取最小距离，再取每段中第一个等于最小值的障碍物
+        counts = np.bincount(rows, minlength=len(points))
+        found = counts > 0
+        min_dist2 = np.full(len(points), np.inf, dtype=np.float32)
+        result = np.empty((len(points), 2), dtype=np.float32)
+        if len(rows):
+            segment_starts = (np.cumsum(counts) - counts)[found]
+            min_dist2[found] = np.minimum.reduceat(dist2, segment_starts)
+            is_min = np.flatnonzero(dist2 == min_dist2[rows])
+            first = is_min[np.r_[True, rows[is_min[1:]] != rows[is_min[:-1]]]]
+            result[rows[first]] = positions[first]
+        return found, min_dist2, result
+
+    def _ring_nearest(self, points, groups):
+        """
+        逐圈扩大范围查找最近的障碍物（point_nearest 的向量化版本）：每轮检查各点所在单元外第 r 圈的单元，
+        最近距离不超过 r 个单元边长的点（r + 1 圈及更外的单元不会更近）不再继续
+        """
+        cells = np.clip(self._cells(points), 0, self.side - 1)
+        best = np.full(len(points), np.inf, dtype=np.float32)
+        result = np.empty((len(points), 2), dtype=np.float32)
+        pending = np.arange(len(points))
+        r = 0
+        # 第 side - 1 圈覆盖到整个网格
+        while len(pending) and r < self.side:
+            rows, positions = self._gather(cells[pending], groups[pending], *self._ring_offsets(r))
+            _, dist2, nearest = self._segment_nearest(points[pending], rows, positions)
+            closer = dist2 < best[pending]
+            best[pending[closer]] = dist2[closer]
+            result[pending[closer]] = nearest[closer]
+            pending = pending[best[pending] > (r * self.cell_size) ** 2]
+            r += 1
+        return result
@@ -0,0 +1,142 @@
+"""
+网格动态规划规划器：给定场景的精确最优回报基线
+ego从原点出发、每步沿坐标轴移动1.0，所有可达位置都是整数格点；
+奖励只依赖移动前后的位置（reward.compute_rewards），因此可以在观察范围内的格点上
+对有限步数上限做逆向值迭代，得到每个场景的最优回报和最优动作序列
+
+用法: python planner.py [--policy ppo_decision] [--episodes 200]  # 计算策略相对最优回报的regret
+"""
+import argparse
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from env import ACTION_DIRS, MAX_EPISODE_STEPS
+from reward import compute_rewards
+
+# 格点范围（与观察空间的 ±100 一致），移出范围的动作不考虑
+BOUND = 100
+
+# 已求解的场景：(destination, obs_pos, horizon, bound, gamma, config) -> 结果字典
+# 最多保存 PLAN_CACHE_SIZE 个，超出时丢弃最久未使用的（生成大量场景的数据集时内存不会持续增长）
+PLAN_CACHE_SIZE = 1024
+_plan_cache = OrderedDict()
+
+
+def _transitions(destination, obs_pos, bound, config):
+    """
+    所有格点、所有动作的一步转移，形状均为 (4, 格点数)：
+    下一格点的编号、奖励、是否终止、是否在范围内
+    """
+    side = 2 * bound + 1
+    coords = np.arange(-bound, bound + 1, dtype=np.float32)
+    xs, ys = np.meshgrid(coords, coords, indexing="ij")
+    pos = np.stack([xs.ravel(), ys.ravel()], axis=1)                  # 格点 i = (x + bound) * side + (y + bound)
+    num_states = len(pos)
+
+    destination = np.asarray(destination, dtype=np.float32)
+    obs_pos = np.asarray(obs_pos, dtype=np.float32)
+    to_dest = destination - pos
+    dist = np.sqrt(to_dest[:, 0] * to_dest[:, 0] + to_dest[:, 1] * to_dest[:, 1])
+    initial_dist = np.sqrt(destination[0] * destination[0] + destination[1] * destination[1])
+
+    next_state = np.zeros((4, num_states), dtype=np.int64)
+    rewards = np.zeros((4, num_states), dtype=np.float64)
+    terminal = np.zeros((4, num_states), dtype=bool)
+    valid = np.zeros((4, num_states), dtype=bool)
+    for action in range(4):
+        next_pos = pos + ACTION_DIRS[action]
+        valid[action] = (np.abs(next_pos) <= bound).all(axis=1)
+        ix = np.clip(next_pos[:, 0], -bound, bound).astype(np.int64) + bound
+        iy = np.clip(next_pos[:, 1], -bound, bound).astype(np.int64) + bound
+        next_state[action] = ix * side + iy
+        rewards[action], _, arrived, collided = compute_rewards(
+            next_pos, np.broadcast_to(destination, pos.shape), np.broadcast_to(obs_pos, pos.shape),
+            np.full(num_states, action), dist, np.full(num_states, initial_dist), config=config,
+        )
+        terminal[action] = arrived | collided
+    return next_state, rewards, terminal, valid
+
+
+def solve_scenario(destination, obs_pos, horizon=MAX_EPISODE_STEPS, bound=BOUND, config=None, cache=True, gamma=1.0):
+    """
+    求解一个场景，返回字典：
+        optimal_return: 从原点出发、不超过 horizon 步的最优回报（按 gamma 折扣，默认不折扣）
+        actions: 最优动作序列（int8）
+        terminated: 最优序列是否以到达/碰撞结束（否则在 horizon 步时截断）
+    结果按场景缓存（最近使用的 PLAN_CACHE_SIZE 个）
+    不折扣时，在目标附近徘徊到步数上限（每步都有距离奖励）的回报可能高于直接到达，最优序列会在目标旁边停留；
+    gamma < 1 时后续的距离奖励被折扣，最优序列尽快到达（用作专家示范时使用，见 behavior_cloning.planner_dataset）
+    """
+    destination = np.asarray(destination, dtype=np.float32)
+    obs_pos = np.asarray(obs_pos, dtype=np.float32)
+    key = (destination.tobytes(), obs_pos.tobytes(), horizon, bound, gamma,
+           None if config is None else json.dumps(config, sort_keys=True))
+    if cache and key in _plan_cache:
+        _plan_cache.move_to_end(key)
+        return _plan_cache[key]
+
+    next_state, rewards, terminal, valid = _transitions(destination, obs_pos, bound, config)
+    num_states = next_state.shape[1]
+
+    # 逆向值迭代：values[t] 为还剩 horizon - t 步时的最优值，终止后的值为0
+    values = np.zeros((horizon + 1, num_states), dtype=np.float64)
+    continuing = ~terminal & valid
+    for t in range(horizon - 1, -1, -1):
+        q = rewards + gamma * np.where(continuing, values[t + 1][next_state], 0.0)
+        q[~valid] = -np.inf
+        values[t] = q.max(axis=0)
+
+    # 沿最优动作从原点前进，得到动作序列
+    state = bound * (2 * bound + 1) + bound
+    actions = []
+    terminated = False
+    for t in range(horizon):
+        q = rewards[:, state] + gamma * np.where(continuing[:, state], values[t + 1][next_state[:, state]], 0.0)
+        q[~valid[:, state]] = -np.inf
+        action = int(np.argmax(q))
+        actions.append(action)
+        if terminal[action, state]:
+            terminated = True
+            break
+        state = next_state[action, state]
+
+    result = {
+        "optimal_return": float(values[0][bound * (2 * bound + 1) + bound]),
+        "actions": np.array(actions, dtype=np.int8),
+        "terminated": terminated,
+    }
+    if cache:
+        _plan_cache[key] = result
+        if len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return result
+
+
+def optimal_returns(destination, obs_pos, horizon=MAX_EPISODE_STEPS, config=None):
+    """多个场景（(N, 2) 数组）的最优回报"""
+    return np.array([
+        solve_scenario(d, o, horizon, config=config)["optimal_return"]
+        for d, o in zip(destination, obs_pos)
+    ])
+
+
+if __name__ == "__main__":
+    from numpy_policy import load_policy
+    from rollout import run_episodes
+    from scenario_bank import generate_bank
+
+    parser = argparse.ArgumentParser(description="计算策略相对动态规划最优回报的regret")
+    parser.add_argument("--policy", default="ppo_decision", help="策略路径（.npz 使用NumPy推理）")
+    parser.add_argument("--episodes", type=int, default=200, help="评估场景数")
+    parser.add_argument("--seed", type=int, default=0, help="场景库随机种子")
+    args = parser.parse_args()
+
+    bank = generate_bank(args.episodes, seed=args.seed)
+    result = run_episodes(load_policy(args.policy), scenario_bank=bank)
+    best = optimal_returns(bank.destination, bank.obs_pos)
+    regret = best - result.total_reward
+    print(f"Optimal return: {best.mean():.2f} ± {best.std():.2f}")
+    print(f"Policy return:  {result.total_reward.mean():.2f} ± {result.total_reward.std():.2f}")
+    print(f"Regret:         {regret.mean():.2f} (median {np.median(regret):.2f}, max {regret.max():.2f})")
@@ -0,0 +1,117 @@
+"""
+常驻评估进程：策略只加载一次（torch初始化和检查点解压也只做一次），
+之后的评估、分析和可视化任务通过本地连接提交，直接使用已缓存的策略
+
+启动: python policy_worker.py [--preload ppo_decision] [--port 6010]
+提交: from policy_worker import submit; submit("evaluate", num_episodes=1000)
+
+连接上传输的是pickle数据，能通过认证的客户端即可在本进程中执行任意代码，因此：
+- 认证密钥取自环境变量 POLICY_WORKER_AUTHKEY；未设置时使用 AUTHKEY_FILE 中的随机密钥
+  （首次启动时生成，文件权限为0600，只有同一用户的进程能读取）
+- 只监听本机回环地址，除非通过 POLICY_WORKER_AUTHKEY 或 authkey 参数显式给出密钥
+"""
+import argparse
+import functools
+import ipaddress
+import os
+import secrets
+import socket
+import traceback
+from multiprocessing.connection import Client, Listener
+
+import matplotlib
+
+# 常驻进程中没有显示界面，可视化任务只保存图片
+matplotlib.use("Agg")
+
+from analyze_performance import analyze_performance
+from evaluate import evaluate_model
+from numpy_policy import load_policy
+from visualize_trajectories import visualize_episodes
+
+DEFAULT_ADDRESS = ("localhost", 6010)
+AUTHKEY_FILE = os.path.expanduser("~/.policy_worker_authkey")
+
+# 可提交的任务；各函数内部通过 load_policy 读取缓存的策略
+JOBS = {
+    "evaluate": evaluate_model,
+    "analyze": analyze_performance,
+    "visualize": functools.partial(visualize_episodes, show=False),
+}
+
+
+def load_authkey(create=False):
+    """
+    认证密钥：环境变量 POLICY_WORKER_AUTHKEY，否则读取 AUTHKEY_FILE
+    create=True 时文件不存在则生成随机密钥并以0600权限写入（服务端启动时）
+    """
+    if "POLICY_WORKER_AUTHKEY" in os.environ:
+        return os.environ["POLICY_WORKER_AUTHKEY"].encode()
+    try:
+        with open(AUTHKEY_FILE, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        if not create:
+            raise FileNotFoundError(
+                f"找不到认证密钥文件 {AUTHKEY_FILE}，请先启动 policy_worker.py 或设置 POLICY_WORKER_AUTHKEY") from None
+    authkey = secrets.token_bytes(32)
+    fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(authkey)
+    return authkey
+
+
+def _is_loopback(host):
+    return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+
+
+def serve(address=DEFAULT_ADDRESS, authkey=None, preload=()):
+    """
+    依次处理提交的任务，收到 "shutdown" 后退出
+    authkey 为None时使用 load_authkey；监听非回环地址时必须显式给出密钥（authkey 或 POLICY_WORKER_AUTHKEY）
+    """
+    if authkey is None:
+        if not _is_loopback(address[0]) and "POLICY_WORKER_AUTHKEY" not in os.environ:
+            raise ValueError(f"监听非本机地址 {address[0]} 需要通过 POLICY_WORKER_AUTHKEY 显式设置认证密钥")
+        authkey = load_authkey(create=True)
+    for path in preload:
+        load_policy(path)
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Policy worker listening on {address[0]}:{address[1]}")
+        while True:
+            with listener.accept() as conn:
+                job, kwargs = conn.recv()
+                if job == "shutdown":
+                    conn.send(("ok", None))
+                    break
+                try:
+                    if job not in JOBS:
+                        raise ValueError(f"未知的任务: {job}")
+                    conn.send(("ok", JOBS[job](**kwargs)))
+                except Exception:
+                    conn.send(("error", traceback.format_exc()))
+
+
+def submit(job, address=DEFAULT_ADDRESS, authkey=None, **kwargs):
+    """
+    向常驻进程提交任务并等待结果；任务出错时抛出 RuntimeError（包含进程中的traceback）
+    authkey 为None时使用 load_authkey（与本机的常驻进程相同）
+    """
+    if authkey is None:
+        authkey = load_authkey()
+    with Client(address, authkey=authkey) as conn:
+        conn.send((job, kwargs))
+        status, result = conn.recv()
+    if status == "error":
+        raise RuntimeError(f"policy worker job '{job}' failed:\n{result}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻评估进程")
+    parser.add_argument("--preload", nargs="*", default=["ppo_decision"], help="启动时加载的策略")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0],
+                        help="监听地址（非本机地址需设置环境变量 POLICY_WORKER_AUTHKEY）")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="监听端口")
+    args = parser.parse_args()
+    serve((args.host, args.port), preload=args.preload)
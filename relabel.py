@@ -0,0 +1,135 @@
+"""
+离线奖励重标注：用新的奖励配置重新计算已保存rollout的奖励、回报和终止
+不需要重新仿真，奖励由 reward.compute_rewards 一次性批量计算
+
+用法: python relabel.py <数据集目录> --config new_reward.json [--output 新数据集目录]
+"""
+import argparse
+import json
+
+import numpy as np
+
+from reward import compute_rewards, make_reward_config
+from rollout import RolloutResult, SUCCESS, COLLISION, TIMEOUT, OUTCOME_NAMES
+from trajectory_store import TrajectoryWriter, load_trajectories
+
+
+def relabel(rollout_result, config=None):
+    """
+    用 config 重新计算 rollout_result 的奖励，返回新的 RolloutResult
+
+    新配置下提前终止（到达或碰撞半径变大）的episode在终止步截断；
+    原数据在终止时结束、而新配置下不再终止的episode保留原长度，结果记为超时
+    （轨迹之后的部分没有数据，无法延长）
+    """
+    cfg = make_reward_config(config)
+    num_episodes = rollout_result.num_episodes
+    length = rollout_result.length
+    step_offsets = rollout_result.step_offsets
+    positions = np.asarray(rollout_result.positions)
+    destination = np.asarray(rollout_result.destination)
+
+    # 每一步所属的episode和在episode中的序号；第 s 步前后的轨迹点为 s + i 和 s + i + 1
+    step_episode = np.repeat(np.arange(num_episodes), length)
+    step_index = np.arange(len(step_episode)) - step_offsets[step_episode]
+    before = positions[np.arange(len(step_episode)) + step_episode]
+    after = positions[np.arange(len(step_episode)) + step_episode + 1]
+
+    to_dest = destination[step_episode] - before
+    last_dist = np.sqrt(to_dest[:, 0] * to_dest[:, 0] + to_dest[:, 1] * to_dest[:, 1])
+    initial_dist = np.sqrt(destination[:, 0] * destination[:, 0] + destination[:, 1] * destination[:, 1])
+
+    rewards, _, arrived, collided = compute_rewards(
+        after, destination[step_episode], np.asarray(rollout_result.obs_pos)[step_episode],
+        rollout_result.actions, last_dist, initial_dist[step_episode], config=cfg,
+    )
+
+    # 每个episode第一次终止的步（没有终止时为原长度）
+    done = arrived | collided
+    first_done = length.copy()
+    np.minimum.at(first_done, step_episode[done], step_index[done])
+    new_length = np.minimum(first_done + 1, length)
+
+    keep_step = step_index < new_length[step_episode]
+    keep_point = np.ones(len(positions), dtype=bool)
+    keep_point[np.arange(len(step_episode)) + step_episode + 1] = keep_step
+
+    outcome = np.full(num_episodes, TIMEOUT, dtype=np.int8)
+    terminated = first_done < length
+    last_step = step_offsets[:-1] + new_length - 1
+    outcome[terminated & arrived[last_step]] = SUCCESS
+    outcome[terminated & collided[last_step]] = COLLISION
+
+    kept_rewards = rewards[keep_step]
+    new_offsets = np.concatenate([[0], np.cumsum(new_length)])
+    return RolloutResult(
+        positions=positions[keep_point],
+        actions=np.asarray(rollout_result.actions)[keep_step],
+        rewards=kept_rewards.astype(np.float32),
+        step_offsets=new_offsets,
+        destination=destination,
+        obs_pos=np.asarray(rollout_result.obs_pos),
+        total_reward=np.add.reduceat(kept_rewards, new_offsets[:-1]),
+        outcome=outcome,
+    )
+
+
+def _summary(total_reward, outcome, length):
+    """平均回报、平均长度和各结果的比例"""
+    counts = np.bincount(outcome, minlength=3)
+    n = max(len(outcome), 1)
+    return {
+        "num_episodes": len(outcome),
+        "mean_return": float(total_reward.mean()) if len(outcome) else 0.0,
+        "mean_length": float(length.mean()) if len(outcome) else 0.0,
+        **{f"{name}_rate": float(c / n) for name, c in zip(OUTCOME_NAMES, counts)},
+    }
+
+
+def relabel_store(path, config=None, output=None, chunk_episodes=100_000):
+    """
+    分块重标注数据集，返回 (原汇总, 新汇总)
+    output 不为None时把重标注后的episode写入新的数据集目录
+    """
+    source = load_trajectories(path)
+    writer = TrajectoryWriter(output) if output is not None else None
+    old_total, new_total = [], []
+    old_outcome, new_outcome = [], []
+    old_length, new_length = [], []
+    for start in range(0, source.num_episodes, chunk_episodes):
+        chunk = source.episodes(start, min(start + chunk_episodes, source.num_episodes))
+        relabeled = relabel(chunk, config)
+        if writer is not None:
+            writer.append(relabeled)
+        old_total.append(np.asarray(chunk.total_reward))
+        new_total.append(relabeled.total_reward)
+        old_outcome.append(np.asarray(chunk.outcome))
+        new_outcome.append(relabeled.outcome)
+        old_length.append(chunk.length)
+        new_length.append(relabeled.length)
+    if writer is not None:
+        writer.close()
+
+    old = _summary(np.concatenate(old_total), np.concatenate(old_outcome), np.concatenate(old_length))
+    new = _summary(np.concatenate(new_total), np.concatenate(new_outcome), np.concatenate(new_length))
+    return old, new
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用新的奖励配置重标注已保存的rollout")
+    parser.add_argument("path", help="trajectory_store 数据集目录")
+    parser.add_argument("--config", default=None, help="奖励配置JSON文件（只需给出要修改的项）")
+    parser.add_argument("--output", default=None, help="写入重标注结果的新数据集目录")
+    parser.add_argument("--chunk-episodes", type=int, default=100_000, help="每块episode数")
+    args = parser.parse_args()
+
+    config = None
+    if args.config is not None:
+        with open(args.config) as f:
+            config = json.load(f)
+    old, new = relabel_store(args.path, config, args.output, args.chunk_episodes)
+    print(f"{'':<16}{'original':>12}{'relabeled':>12}")
+    for key in old:
+        print(f"{key:<16}{old[key]:>12.4f}{new[key]:>12.4f}")
+    if args.output is not None:
+        print(f"\nRelabeled dataset saved as: {args.output}")
@@ -0,0 +1,290 @@
+"""
+奖励计算
+- compute_rewards：向量化版本，用掩码代替分支，输入为任意长度的数组，批量环境（batch_env.py）和离线工具使用
+- scalar_reward：单个转移的标量版本，DecisionEnv 的各个 step 使用（附近障碍物很多时障碍物各项用 obstacle_sums 一次计算）
+两者读取同一份奖励配置
+"""
+import numpy as np
+
+# 动作方向表：0=上(y+), 1=下(y-), 2=左(x-), 3=右(x+)
+ACTION_DIRS = np.array([
+    [0.0, 1.0],
+    [0.0, -1.0],
+    [-1.0, 0.0],
+    [1.0, 0.0],
+], dtype=np.float32)
+# 奖励各项的名称（插桩模式下按此顺序记录，见 scalar_reward 的 terms 参数）
+REWARD_TERMS = (
+    "step_penalty", "progress", "distance", "direction",
+    "obstacle_warning", "avoidance", "emergency", "arrival", "collision",
+)
+
+# 奖励系数和半径
+DEFAULT_REWARD_CONFIG = {
+    "step_penalty": 0.01,
+    "progress_weight": 2.0,
+    "overshoot_weight": 2.0,        # 超过初始距离时每单位的惩罚
+    "direction_weight": 0.5,
+    "warning_radius": 25.0,
+    "warning_weight": 1.5,          # 每10单位的警告惩罚
+    "avoidance_radius": 15.0,
+    "avoidance_bonus": 2.0,
+    "avoidance_penalty": 1.5,
+    "emergency_radius": 8.0,
+    "emergency_bonus": 3.0,
+    "emergency_penalty": 2.5,
+    "arrival_radius": 8.0,
+    "arrival_reward": 100.0,
+    "collision_radius": 2.0,
+    "collision_penalty": 200.0,
+}
+
+
+def make_reward_config(config=None):
+    """在默认配置上覆盖 config 中给出的项，未知的键报错"""
+    if config is None:
+        return DEFAULT_REWARD_CONFIG
+    unknown = set(config) - set(DEFAULT_REWARD_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的奖励配置项: {sorted(unknown)}")
+    return {**DEFAULT_REWARD_CONFIG, **config}
+
+
+def scalar_reward_params(config=None):
+    """scalar_reward 用的参数：按 DEFAULT_REWARD_CONFIG 键顺序的配置值元组，在环境构造时计算一次"""
+    cfg = make_reward_config(config)
+    return tuple(cfg[key] for key in DEFAULT_REWARD_CONFIG)
+
+
+def scalar_reward(params, axis, sign, to_dest, dist_to_dest, last_dist, initial_dist, obstacles, terms=None,
+                  obstacle_totals=None):
+    """
+    单个转移的奖励（标量运算，逐项按固定顺序累加，单障碍物时与原始 DecisionEnv.step 逐位相同）
+
+    params: scalar_reward_params 的结果
+    axis, sign: 动作所在的坐标轴和方向（动作方向是单位坐标轴，点积即对应分量乘以符号）
+    to_dest, dist_to_dest: 执行动作后到目标的向量 (x, y) 和距离
+    last_dist, initial_dist: 执行动作前和episode开始时到目标的距离
+    obstacles: 附近障碍物的 (到障碍物的向量, 距离) 序列，各障碍物的警告/避障奖励相加，碰撞任意一个即为碰撞
+    terms: 长度为 len(REWARD_TERMS) 的数组，不为None时各项累加到对应位置（插桩模式用）
+    obstacle_totals: obstacle_sums 的结果，不为None时加上这些障碍物的合计（与 obstacles 中的障碍物一起计算）
+
+    返回 (reward, arrived, collided)
+    """
+    (step_penalty, progress_weight, overshoot_weight, direction_weight,
+     warning_radius, warning_weight, avoidance_radius, avoidance_bonus, avoidance_penalty,
+     emergency_radius, emergency_bonus, emergency_penalty,
+     arrival_radius, arrival_reward, collision_radius, collision_penalty) = params
+    record = terms is not None
+
+    reward = -step_penalty  # 每步小惩罚
+
+    # 1. 进度奖励：基于距离减少（鼓励向目标前进）
+    progress_reward = (last_dist - dist_to_dest) * progress_weight
+    reward += progress_reward
+
+    # 2. 距离奖励：超过初始距离给负奖励，否则平方增长（越近奖励增长越快）
+    normalized_dist = dist_to_dest / (initial_dist + 1e-6)
+    if normalized_dist > 1.0:
+        distance_reward = -(normalized_dist - 1.0) * overshoot_weight
+    else:
+        distance_reward = (1.0 - normalized_dist) ** 2
+    reward += distance_reward
+    if record:
+        terms[0] -= step_penalty
+        terms[1] += progress_reward
+        terms[2] += distance_reward
+
+    # 3. 方向奖励：动作朝向目标时奖励（系数为0时跳过）
+    if direction_weight and dist_to_dest > 1e-6:
+        direction_alignment = np.float64(to_dest[axis] / dist_to_dest) * sign
+        if direction_alignment > 0:
+            direction_reward = direction_alignment * direction_weight
+            reward += direction_reward
+            if record:
+                terms[3] += direction_reward
+
+    collided = False
+    for to_obs, dist_to_obs in obstacles:
+        # 5. 渐进式碰撞警告：距离障碍物越近，惩罚越大
+        if dist_to_obs < warning_radius:
+            obs_penalty = (warning_radius - dist_to_obs) / 10.0 * warning_weight
+            reward -= obs_penalty
+            if record:
+                terms[4] -= obs_penalty
+
+        # 5.1 避障：远离障碍物奖励，朝向障碍物惩罚（负点积，因为要远离）
+        if 1e-6 < dist_to_obs < avoidance_radius:
+            avoidance_alignment = -(np.float64(to_obs[axis] / dist_to_obs) * sign)
+            if avoidance_alignment > 0:
+                avoidance_reward = avoidance_alignment * (avoidance_radius - dist_to_obs) / avoidance_radius \
+                    * avoidance_bonus
+                reward += avoidance_reward
+            elif avoidance_alignment < 0:
+                approach_penalty = -avoidance_alignment * (avoidance_radius - dist_to_obs) / avoidance_radius \
+                    * avoidance_penalty
+                reward -= approach_penalty
+                avoidance_reward = -approach_penalty
+            else:
+                avoidance_reward = 0.0
+            if record:
+                terms[5] += avoidance_reward
+
+        # 5.2 紧急避障：非常接近障碍物时，奖励和惩罚大幅增强（与避障各自判断半径，同 compute_rewards）
+        if 1e-6 < dist_to_obs < emergency_radius:
+            emergency_alignment = -(np.float64(to_obs[axis] / dist_to_obs) * sign)
+            if emergency_alignment > 0:
+                emergency_reward = emergency_alignment * (emergency_radius - dist_to_obs) / emergency_radius \
+                    * emergency_bonus
+                reward += emergency_reward
+            elif emergency_alignment < 0:
+                emergency_penalty_value = -emergency_alignment * (emergency_radius - dist_to_obs) \
+                    / emergency_radius * emergency_penalty
+                reward -= emergency_penalty_value
+                emergency_reward = -emergency_penalty_value
+            else:
+                emergency_reward = 0.0
+            if record:
+                terms[6] += emergency_reward
+
+        if dist_to_obs < collision_radius:
+            collided = True
+
+    if obstacle_totals is not None:
+        warning_total, avoidance_total, emergency_total, any_collided = obstacle_totals
+        reward -= warning_total
+        reward += avoidance_total
+        reward += emergency_total
+        collided = collided or any_collided
+        if record:
+            terms[4] -= warning_total
+            terms[5] += avoidance_total
+            terms[6] += emergency_total
+
+    # 6. 到达目标
+    arrived = False
+    if dist_to_dest < arrival_radius:
+        reward += arrival_reward
+        arrived = True
+        if record:
+            terms[7] += arrival_reward
+
+    # 7. 碰撞障碍物
+    if collided:
+        reward -= collision_penalty
+        if record:
+            terms[8] -= collision_penalty
+    return reward, arrived, collided
+
+
+def obstacle_sums(params, axis, sign, to_obs, dist_to_obs):
+    """
+    scalar_reward 中障碍物各项的向量化版本：同一个动作下 M 个障碍物的各项一次计算后求和
+    to_obs: (M, 2) 到各障碍物的向量；dist_to_obs: (M,) 距离
+    返回 (警告惩罚合计, 避障奖励合计, 紧急避障奖励合计, 是否碰撞)，作为 scalar_reward 的 obstacle_totals 参数
+    """
+    (_, _, _, _, warning_radius, warning_weight, avoidance_radius, avoidance_bonus, avoidance_penalty,
+     emergency_radius, emergency_bonus, emergency_penalty, _, _, collision_radius, _) = params
+
+    # 5. 渐进式碰撞警告
+    warning = np.maximum(warning_radius - dist_to_obs, 0.0).sum() / 10.0 * warning_weight
+
+    # 5.1 / 5.2 避障与紧急避障：alignment 为负点积，正值为远离（距离过小的障碍物不计）
+    alignment = np.divide(to_obs[:, axis], dist_to_obs, out=np.zeros_like(dist_to_obs), where=dist_to_obs > 1e-6)
+    alignment *= -sign
+    away = alignment > 0
+    totals = []
+    for radius, bonus, penalty in ((avoidance_radius, avoidance_bonus, avoidance_penalty),
+                                   (emergency_radius, emergency_bonus, emergency_penalty)):
+        # 半径为0时该项不计算（同 scalar_reward）
+        scale = np.maximum(radius - dist_to_obs, 0.0)
+        totals.append((alignment * scale * np.where(away, bonus, penalty)).sum() / radius if radius > 0 else 0.0)
+
+    return warning, totals[0], totals[1], bool((dist_to_obs < collision_radius).any())
+
+
+def _obstacle_terms(to_obs, action_dir, cfg):
+    """
+    障碍物相关的各项（每行一个 (ego, 障碍物) 对）：
+    返回 (警告惩罚, 避障奖励, 紧急避障奖励, 是否碰撞)，警告惩罚为正值，从奖励中减去
+    """
+    dist_to_obs = np.sqrt(to_obs[:, 0] * to_obs[:, 0] + to_obs[:, 1] * to_obs[:, 1])
+
+    # 5. 渐进式碰撞警告
+    warning = np.maximum(cfg["warning_radius"] - dist_to_obs, 0.0) / 10.0 * cfg["warning_weight"]
+
+    # 5.1 / 5.2 避障奖励与紧急避障：正值奖励远离，负值惩罚接近
+    safe_obs = np.where(dist_to_obs > 1e-6, dist_to_obs, 1.0)
+    avoidance_alignment = -(action_dir * to_obs).sum(axis=1) / safe_obs
+    avoidance_alignment[dist_to_obs <= 1e-6] = 0.0
+    avoid_scale = np.maximum(cfg["avoidance_radius"] - dist_to_obs, 0.0) / cfg["avoidance_radius"]
+    avoidance = avoidance_alignment * avoid_scale * np.where(
+        avoidance_alignment > 0, cfg["avoidance_bonus"], cfg["avoidance_penalty"])
+    emergency_scale = np.maximum(cfg["emergency_radius"] - dist_to_obs, 0.0) / cfg["emergency_radius"]
+    emergency = avoidance_alignment * emergency_scale * np.where(
+        avoidance_alignment > 0, cfg["emergency_bonus"], cfg["emergency_penalty"])
+
+    return warning, avoidance, emergency, dist_to_obs < cfg["collision_radius"]
+
+
+def compute_rewards(ego, dest, obs, action, last_dist, initial_dist, config=None, obs_rows=None):
+    """
+    计算一批转移的奖励
+
+    ego: (N, 2) 执行动作后的ego位置
+    dest: (N, 2) 目标位置
+    obs: (N, 2) 障碍物位置；obs_rows 不为None时为 (M, 2) 的多个障碍物，第 j 个属于第 obs_rows[j] 行
+    action: (N,) 动作
+    last_dist: (N,) 执行动作前到目标的距离
+    initial_dist: (N,) episode开始时到目标的距离
+    config: 覆盖 DEFAULT_REWARD_CONFIG 中部分项的字典，None 为默认奖励
+    obs_rows: (M,) 多障碍物时每个障碍物所属的行，各障碍物的警告/避障奖励相加，碰撞任意一个即为碰撞
+              （只需传入各行附近的障碍物，见 obstacle_grid.ObstacleGrid.query）
+
+    返回 (reward, dist_to_dest, arrived, collided)，reward 为 float64，
+    dist_to_dest 可作为下一步的 last_dist
+    """
+    cfg = make_reward_config(config)
+    ego = np.asarray(ego, dtype=np.float32)
+    to_dest = np.asarray(dest, dtype=np.float32) - ego
+    dist_to_dest = np.sqrt(to_dest[:, 0] * to_dest[:, 0] + to_dest[:, 1] * to_dest[:, 1])
+    action_dir = ACTION_DIRS[np.asarray(action, dtype=np.int64)]
+
+    if obs_rows is None:
+        warning, avoidance, emergency, collided = _obstacle_terms(
+            np.asarray(obs, dtype=np.float32) - ego, action_dir, cfg)
+    else:
+        obs_rows = np.asarray(obs_rows, dtype=np.int64)
+        terms = _obstacle_terms(np.asarray(obs, dtype=np.float32) - ego[obs_rows], action_dir[obs_rows], cfg)
+        warning, avoidance, emergency = (np.bincount(obs_rows, term, minlength=len(ego)) for term in terms[:3])
+        collided = np.bincount(obs_rows, terms[3], minlength=len(ego)) > 0
+
+    reward = np.full(len(ego), -cfg["step_penalty"])  # 每步小惩罚
+
+    # 1. 进度奖励
+    reward += (np.asarray(last_dist, dtype=np.float32) - dist_to_dest) * cfg["progress_weight"]
+
+    # 2. 距离奖励：超过初始距离给负奖励，否则平方增长
+    normalized_dist = dist_to_dest / (np.asarray(initial_dist, dtype=np.float32) + np.float32(1e-6))
+    reward += np.where(
+        normalized_dist > 1.0,
+        -(normalized_dist - 1.0) * cfg["overshoot_weight"],
+        (1.0 - normalized_dist) ** 2
+    )
+
+    # 3. 方向奖励：动作朝向目标时奖励
+    safe_dest = np.where(dist_to_dest > 1e-6, dist_to_dest, 1.0)
+    direction_alignment = (action_dir * to_dest).sum(axis=1) / safe_dest
+    direction_alignment[dist_to_dest <= 1e-6] = 0.0
+    reward += np.maximum(direction_alignment, 0.0) * cfg["direction_weight"]
+
+    # 5. 障碍物警告 / 5.1 避障 / 5.2 紧急避障（见 _obstacle_terms）
+    reward -= warning
+    reward += avoidance
+    reward += emergency
+
+    # 6. 到达目标 / 7. 碰撞障碍物
+    arrived = dist_to_dest < cfg["arrival_radius"]
+    reward += np.where(arrived, cfg["arrival_reward"], 0.0)
+    reward -= np.where(collided, cfg["collision_penalty"], 0.0)
+    return reward, dist_to_dest, arrived, collided
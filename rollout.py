@@ -0,0 +1,199 @@
+"""
+共享的批量rollout引擎
+多个环境同步前进，每步只做一次批量前向推理，轨迹、动作、奖励和结果写入列式的 RolloutResult，
+evaluate.py、analyze_performance.py 和 visualize_trajectories.py 都读取同一个结果
+"""
+import numpy as np
+
+from batch_env import BatchDecisionEnv
+from env import MAX_EPISODE_STEPS, make_observation
+from numpy_policy import observation_config
+from reward import make_reward_config
+
+# episode结果编码
+SUCCESS, COLLISION, TIMEOUT = 0, 1, 2
+OUTCOME_NAMES = ("success", "collision", "timeout")
+
+
+def classify_outcome(ego_pos, destination, obs_pos, config=None):
+    """
+    根据最终位置判断结果：碰撞优先，其次到达，否则超时
+    到达和碰撞半径取自奖励配置（config 覆盖 reward.DEFAULT_REWARD_CONFIG 中的部分项，与环境的终止条件相同）
+    """
+    cfg = make_reward_config(config)
+    dist_to_dest = np.linalg.norm(destination - ego_pos, axis=1)
+    dist_to_obs = np.linalg.norm(obs_pos - ego_pos, axis=1)
+    outcome = np.full(len(ego_pos), TIMEOUT, dtype=np.int8)
+    outcome[dist_to_dest < cfg["arrival_radius"]] = SUCCESS
+    outcome[dist_to_obs < cfg["collision_radius"]] = COLLISION
+    return outcome
+
+
+def chunk_seeds(seed, num_chunks):
+    """
+    分块运行时每块的种子：由 np.random.SeedSequence(seed).spawn 派生，互相独立，
+    不同的 seed（即使相邻）不会共用任何一块的场景；seed 为None时各块都不设种子
+    """
+    if seed is None:
+        return [None] * num_chunks
+    return np.random.SeedSequence(seed).spawn(num_chunks)
+
+
+class RolloutResult:
+    """
+    列式存储的rollout结果
+
+    每步数据（actions, rewards）按episode顺序拼接，episode i 占 step_offsets[i]:step_offsets[i+1]；
+    轨迹点（positions）包含初始位置，每个episode比步数多一个点，episode i 占
+    step_offsets[i] + i : step_offsets[i+1] + i + 1
+    """
+
+    def __init__(self, positions, actions, rewards, step_offsets, destination, obs_pos,
+                 total_reward=None, outcome=None):
+        self.positions = positions          # (总步数 + episode数, 2) float32
+        self.actions = actions              # (总步数,) int8
+        self.rewards = rewards              # (总步数,) float32
+        self.step_offsets = step_offsets    # (episode数 + 1,) int64
+        self.destination = destination      # (episode数, 2) float32
+        self.obs_pos = obs_pos              # (episode数, 2) float32
+
+        self.length = np.diff(step_offsets)
+        self.point_offsets = step_offsets + np.arange(len(step_offsets))
+        self.final_pos = positions[self.point_offsets[1:] - 1]
+        self.final_dist = np.linalg.norm(self.destination - self.final_pos, axis=1)
+        # 每个episode的汇总列，已保存的结果（如trajectory_store）可直接传入，避免扫描全部奖励
+        if total_reward is None:
+            total_reward = np.add.reduceat(np.asarray(rewards, dtype=np.float64), step_offsets[:-1])
+        if outcome is None:
+            outcome = classify_outcome(self.final_pos, self.destination, self.obs_pos)
+        self.total_reward = total_reward
+        self.outcome = outcome
+
+    @property
+    def num_episodes(self):
+        return len(self.length)
+
+    def episodes(self, start, stop):
+        """取出第 start 到 stop-1 个episode，返回新的 RolloutResult（数组为切片视图）"""
+        s0, s1 = self.step_offsets[start], self.step_offsets[stop]
+        p0, p1 = self.point_offsets[start], self.point_offsets[stop]
+        return RolloutResult(
+            positions=self.positions[p0:p1],
+            actions=self.actions[s0:s1],
+            rewards=self.rewards[s0:s1],
+            step_offsets=self.step_offsets[start:stop + 1] - s0,
+            destination=self.destination[start:stop],
+            obs_pos=self.obs_pos[start:stop],
+            total_reward=self.total_reward[start:stop],
+            outcome=self.outcome[start:stop],
+        )
+
+    def trajectory(self, i):
+        return self.positions[self.point_offsets[i]:self.point_offsets[i + 1]]
+
+    def episode_actions(self, i):
+        return self.actions[self.step_offsets[i]:self.step_offsets[i + 1]]
+
+    def episode_rewards(self, i):
+        return self.rewards[self.step_offsets[i]:self.step_offsets[i + 1]]
+
+    def point_episode(self):
+        """每个轨迹点所属的episode编号"""
+        return np.repeat(np.arange(self.num_episodes), self.length + 1)
+
+    def point_dist_to_dest(self):
+        """每个轨迹点到目标的距离"""
+        return np.linalg.norm(self.destination[self.point_episode()] - self.positions, axis=1)
+
+    def step_dist_before(self):
+        """每一步执行动作前到目标的距离（即去掉每个episode最后一个轨迹点）"""
+        last_point = np.zeros(len(self.positions), dtype=bool)
+        last_point[self.point_offsets[1:] - 1] = True
+        return self.point_dist_to_dest()[~last_point]
+
+
+def run_episodes(model, num_episodes=None, num_envs=256, max_steps=MAX_EPISODE_STEPS, seed=None,
+                 scenario_bank=None, normalize_obs=None, obs_mode=None):
+    """
+    用 num_envs 个并行环境跑完 num_episodes 个episode，返回 RolloutResult
+    某个槽位的episode结束（终止或达到 max_steps 被环境截断）后，环境自动在该槽位开始下一个episode
+
+    model: 带 predict(obs_batch, deterministic=True) 的策略（PPO 或 numpy_policy.NumpyPolicy）
+    scenario_bank: scenario_bank.ScenarioBank，设置时第 i 个episode使用场景 i，
+        num_episodes 默认为场景数（即遍历整个场景库）
+    normalize_obs, obs_mode: 策略训练时使用的观察（环境内部始终记录原始坐标，传给策略前转换），
+        None 时使用模型保存的配置（numpy_policy.observation_config）
+    max_steps 必须是有限值：每个槽位的缓冲区按它预分配，且不会结束episode的策略会使评估永远运行下去
+    """
+    if max_steps is None:
+        raise ValueError("run_episodes 需要有限的 max_steps")
+    model_obs_mode, model_normalize_obs = observation_config(model)
+    obs_mode = model_obs_mode if obs_mode is None else obs_mode
+    normalize_obs = model_normalize_obs if normalize_obs is None else normalize_obs
+    if num_episodes is None:
+        num_episodes = len(scenario_bank)
+    num_envs = min(num_envs, num_episodes)
+    venv = BatchDecisionEnv(num_envs, max_episode_steps=max_steps, scenario_bank=scenario_bank)
+    obs = venv.reset(seed=seed)
+
+    # 每个episode的数据块，结束后按编号存放
+    chunks = [None] * num_episodes
+    destination = np.zeros((num_episodes, 2), dtype=np.float32)
+    obs_pos = np.zeros((num_episodes, 2), dtype=np.float32)
+
+    # 每个槽位当前episode的编号（由环境按开始顺序分配）和缓冲区
+    all_slots = np.arange(num_envs)
+    slot_episode = venv.episode_ids.copy()
+    slot_steps = np.zeros(num_envs, dtype=np.int64)
+    slot_pos = np.zeros((max_steps + 1, num_envs, 2), dtype=np.float32)
+    slot_actions = np.zeros((max_steps, num_envs), dtype=np.int8)
+    slot_rewards = np.zeros((max_steps, num_envs), dtype=np.float32)
+    slot_pos[0] = venv.ego_pos
+    destination[slot_episode] = venv.destination
+    obs_pos[slot_episode] = venv.obs_pos
+
+    # 编号超过 num_episodes 的episode不再统计
+    while (slot_episode < num_episodes).any():
+        policy_obs = make_observation(obs, obs_mode, normalize_obs)
+        actions, _ = model.predict(policy_obs, deterministic=True)
+        slot_actions[slot_steps, all_slots] = actions
+        obs, rewards, dones, infos = venv.step(actions)
+        slot_rewards[slot_steps, all_slots] = rewards
+
+        # 结束的槽位已被自动重置，位置取终止前的观察
+        next_pos = obs[:, 0:2].copy()
+        for slot in np.flatnonzero(dones):
+            next_pos[slot] = infos[slot]["terminal_observation"][0:2]
+        slot_steps += 1
+        slot_pos[slot_steps, all_slots] = next_pos
+
+        ended = np.flatnonzero(dones)
+        if len(ended) == 0:
+            continue
+
+        # 保存仍在统计中的episode
+        for slot in ended[slot_episode[ended] < num_episodes]:
+            n = slot_steps[slot]
+            chunks[slot_episode[slot]] = (
+                slot_pos[:n + 1, slot].copy(),
+                slot_actions[:n, slot].copy(),
+                slot_rewards[:n, slot].copy(),
+            )
+        slot_steps[ended] = 0
+        slot_pos[0, ended] = venv.ego_pos[ended]
+
+        # 记录新开始的episode的场景
+        slot_episode[ended] = venv.episode_ids[ended]
+        started = ended[slot_episode[ended] < num_episodes]
+        destination[slot_episode[started]] = venv.destination[started]
+        obs_pos[slot_episode[started]] = venv.obs_pos[started]
+
+    lengths = np.array([len(c[1]) for c in chunks], dtype=np.int64)
+    return RolloutResult(
+        positions=np.concatenate([c[0] for c in chunks]),
+        actions=np.concatenate([c[1] for c in chunks]),
+        rewards=np.concatenate([c[2] for c in chunks]),
+        step_offsets=np.concatenate([[0], np.cumsum(lengths)]),
+        destination=destination,
+        obs_pos=obs_pos,
+    )
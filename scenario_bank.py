@@ -0,0 +1,60 @@
+"""
+预生成的场景库：固定的 (destination, obs_pos) 数组，按 DecisionEnv.reset 的分布采样
+不同模型在同一组场景上评估（配对比较），噪声远小于各自随机采样场景
+
+用法: python scenario_bank.py --num-scenarios 10000 --seed 0 --output scenarios.npz
+"""
+import argparse
+
+import numpy as np
+
+from env import sample_scenarios
+
+BANK_VERSION = 1
+
+
+class ScenarioBank:
+    """场景库，第 i 个场景为 (destination[i], obs_pos[i])"""
+
+    def __init__(self, destination, obs_pos, seed=None):
+        self.destination = np.ascontiguousarray(destination, dtype=np.float32)
+        self.obs_pos = np.ascontiguousarray(obs_pos, dtype=np.float32)
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.destination)
+
+    def save(self, path):
+        np.savez(
+            path,
+            version=BANK_VERSION,
+            seed=-1 if self.seed is None else self.seed,
+            destination=self.destination,
+            obs_pos=self.obs_pos,
+        )
+
+
+def generate_bank(num_scenarios, seed=0):
+    """用 DecisionEnv 的场景分布生成 num_scenarios 个场景"""
+    destination, obs_pos = sample_scenarios(np.random.default_rng(seed), num_scenarios)
+    return ScenarioBank(destination, obs_pos, seed=seed)
+
+
+def load_bank(path):
+    with np.load(path) as data:
+        version = int(data["version"])
+        if version != BANK_VERSION:
+            raise ValueError(f"不支持的场景库版本: {version}")
+        seed = int(data["seed"])
+        return ScenarioBank(data["destination"], data["obs_pos"], seed=None if seed < 0 else seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成固定的评估场景库")
+    parser.add_argument("--num-scenarios", type=int, default=10_000, help="场景数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default="scenarios.npz", help="输出文件")
+    args = parser.parse_args()
+
+    generate_bank(args.num_scenarios, args.seed).save(args.output)
+    print(f"Scenario bank saved as: {args.output}")
@@ -0,0 +1,73 @@
+"""
+流式统计
+数据分块到来时更新计数、矩和近似分位数，内存占用固定，与数据总量无关
+"""
+import numpy as np
+
+
+class RunningMoments:
+    """计数、均值、方差、最小值、最大值（分块合并的Welford算法）"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def var(self):
+        return self._m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+class StreamingDistribution(RunningMoments):
+    """
+    在矩的基础上用固定区间的直方图估计分位数
+    分位数误差不超过一个区间宽度 (high - low) / bins，超出范围的值计入两端区间
+    """
+
+    def __init__(self, low, high, bins=10_000):
+        super().__init__()
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        super().update(values)
+        bins = len(self.counts)
+        idx = ((values - self.low) / (self.high - self.low) * bins).astype(np.int64)
+        self.counts += np.bincount(np.clip(idx, 0, bins - 1), minlength=bins)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, q * self.count))
+        i = min(i, len(self.counts) - 1)
+        # 区间中点，并限制在已观测到的最小/最大值之内
+        width = (self.high - self.low) / len(self.counts)
+        return float(np.clip(self.low + (i + 0.5) * width, self.min, self.max))
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
@@ -0,0 +1,179 @@
+"""
+多组超参数/种子的并行训练
+每个配置在进程池中调用 train.train，训练后在同一个固定场景库上评估，结果汇总为一张CSV表
+
+用法:
+    python sweep.py --grid space.json --seeds 0 1 2
+    python sweep.py --grid space.json --random 50 --seeds 0 1
+space.json 为参数名到候选值列表的映射，如 {"learning_rate": [1e-4, 3e-4], "ent_coef": [0.0, 0.01]}
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+# 默认搜索空间（与 train.py 的默认值相同）
+DEFAULT_SPACE = {
+    "n_steps": [512],
+    "batch_size": [64],
+    "learning_rate": [3e-4],
+    "ent_coef": [0.01],
+    "total_timesteps": [300_000],
+}
+
+# 线程数相关的环境变量，BLAS库只在加载时读取，需在工作进程启动前设置（见 run_sweep）
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+# _run_one 返回的评估结果列（在配置参数之后）；失败的运行只有 error 列
+_RESULT_FIELDS = ("success_rate", "collision_rate", "timeout_rate", "mean_reward", "mean_length",
+                  "train_seconds", "model_path", "error")
+
+
+def grid_configs(space, seeds):
+    """搜索空间的全部组合，每个组合对每个种子各运行一次"""
+    names = list(space)
+    return [
+        {**dict(zip(names, values)), "seed": seed}
+        for values in itertools.product(*(space[name] for name in names))
+        for seed in seeds
+    ]
+
+
+def random_configs(space, seeds, num_configs, rng_seed=0):
+    """从搜索空间中随机抽取 num_configs 个组合（每个参数从候选值中均匀选取），每个组合对每个种子各运行一次"""
+    rng = np.random.default_rng(rng_seed)
+    configs = []
+    for _ in range(num_configs):
+        values = {name: space[name][rng.integers(len(space[name]))] for name in space}
+        # 转回Python标量，便于写入JSON/CSV
+        values = {name: v.item() if isinstance(v, np.generic) else v for name, v in values.items()}
+        configs.extend({**values, "seed": seed} for seed in seeds)
+    return configs
+
+
+def _init_worker(threads):
+    """工作进程初始化：限制torch线程数（BLAS线程数由父进程设置的环境变量限制），避免多个进程互相抢占CPU"""
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _run_one(run_id, config, out_dir, bank_path):
+    """训练一个配置并在场景库上评估，返回一行结果"""
+    from rollout import run_episodes, SUCCESS, COLLISION, TIMEOUT
+    from scenario_bank import load_bank
+    from train import train
+
+    save_path = os.path.join(out_dir, f"run_{run_id:04d}")
+    start = time.perf_counter()
+    model = train(save_path=save_path, verbose=0, **config)
+    train_seconds = time.perf_counter() - start
+
+    result = run_episodes(model, scenario_bank=load_bank(bank_path), num_envs=1024)
+    outcome_counts = np.bincount(result.outcome, minlength=3)
+    return {
+        "run_id": run_id,
+        **config,
+        "success_rate": outcome_counts[SUCCESS] / result.num_episodes,
+        "collision_rate": outcome_counts[COLLISION] / result.num_episodes,
+        "timeout_rate": outcome_counts[TIMEOUT] / result.num_episodes,
+        "mean_reward": float(np.mean(result.total_reward)),
+        "mean_length": float(np.mean(result.length)),
+        "train_seconds": train_seconds,
+        "model_path": save_path,
+    }
+
+
+def run_sweep(configs, out_dir="sweep_runs", processes=None, threads_per_worker=1, eval_episodes=1000,
+              eval_seed=0, output="sweep_results.csv"):
+    """
+    在进程池中运行全部配置，返回结果列表（按 run_id 排序）
+    每个运行结束后立即追加到 output CSV（按完成顺序），中途中断时已完成的结果不会丢失；
+    出错的运行记录为只有配置和 error 列的一行，不影响其他运行
+    processes 默认为 CPU核数 // threads_per_worker；所有配置在同一个场景库上评估，结果可直接配对比较
+    """
+    from scenario_bank import generate_bank
+
+    os.makedirs(out_dir, exist_ok=True)
+    bank_path = os.path.join(out_dir, "eval_scenarios.npz")
+    generate_bank(eval_episodes, seed=eval_seed).save(bank_path)
+    if processes is None:
+        processes = max((os.cpu_count() or 1) // threads_per_worker, 1)
+
+    config_fields = list(dict.fromkeys(name for config in configs for name in config))
+    fieldnames = ["run_id", *config_fields, *_RESULT_FIELDS]
+    rows = []
+    # 工作进程（spawn）继承父进程的环境变量，在其导入numpy/torch之前生效
+    saved_env = {var: os.environ.get(var) for var in _THREAD_ENV_VARS}
+    os.environ.update({var: str(threads_per_worker) for var in _THREAD_ENV_VARS})
+    try:
+        ctx = mp.get_context("spawn")
+        with open(output, "w", newline="") as f, \
+                ProcessPoolExecutor(processes, mp_context=ctx, initializer=_init_worker,
+                                    initargs=(threads_per_worker,)) as pool:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            f.flush()
+            futures = {pool.submit(_run_one, i, config, out_dir, bank_path): i for i, config in enumerate(configs)}
+            for future in as_completed(futures):
+                run_id = futures[future]
+                try:
+                    row = future.result()
+                    status = (f"success={row['success_rate']:.3f} reward={row['mean_reward']:.2f} "
+                              f"({row['train_seconds']:.0f}s)")
+                except Exception as e:
+                    row = {"run_id": run_id, **configs[run_id], "error": f"{type(e).__name__}: {e}"}
+                    status = f"failed\n{''.join(traceback.format_exception(e))}"
+                rows.append(row)
+                writer.writerow(row)
+                f.flush()
+                print(f"[{len(rows)}/{len(configs)}] run {run_id}: {status}")
+    finally:
+        for var, value in saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+    rows.sort(key=lambda r: r["run_id"])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并行的超参数/种子训练扫描")
+    parser.add_argument("--grid", default=None, help="搜索空间JSON文件（参数名 -> 候选值列表），缺省项使用默认值")
+    parser.add_argument("--random", type=int, default=None, help="随机抽取的组合数（不设置时运行全部组合）")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="每个组合运行的随机种子")
+    parser.add_argument("--processes", type=int, default=None, help="并行进程数（默认 CPU核数 // 每进程线程数）")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="每个进程的torch线程数")
+    parser.add_argument("--eval-episodes", type=int, default=1000, help="评估场景数")
+    parser.add_argument("--out-dir", default="sweep_runs", help="模型保存目录")
+    parser.add_argument("--output", default="sweep_results.csv", help="结果CSV文件")
+    args = parser.parse_args()
+
+    space = dict(DEFAULT_SPACE)
+    if args.grid is not None:
+        with open(args.grid) as f:
+            space.update(json.load(f))
+    if args.random is None:
+        configs = grid_configs(space, args.seeds)
+    else:
+        configs = random_configs(space, args.seeds, args.random)
+    print(f"Running {len(configs)} configurations...")
+
+    rows = run_sweep(configs, args.out_dir, args.processes, args.threads_per_worker, args.eval_episodes,
+                     output=args.output)
+    completed = [row for row in rows if "error" not in row]
+    print(f"\n{'run':>4} {'success':>8} {'collision':>10} {'reward':>9}  config")
+    for row in sorted(completed, key=lambda r: -r["mean_reward"]):
+        config = {k: row[k] for k in configs[row["run_id"]]}
+        print(f"{row['run_id']:>4} {row['success_rate']:>8.3f} {row['collision_rate']:>10.3f} "
+              f"{row['mean_reward']:>9.2f}  {config}")
+    for row in rows:
+        if "error" in row:
+            print(f"{row['run_id']:>4} failed: {row['error']}")
+    print(f"\nSweep results saved as: {args.output}")
@@ -0,0 +1,17 @@
+"""
+DecisionEnv 的接口检查：各种模式下都通过 SB3 的 check_env（奖励为Python float等）
+"""
+import pytest
+from stable_baselines3.common.env_checker import check_env
+
+from env import DecisionEnv
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"instrument": True},
+    {"num_obstacles": 20},
+    {"obs_mode": "egocentric", "normalize_obs": True},
+])
+def test_check_env(kwargs):
+    check_env(DecisionEnv(**kwargs))
@@ -0,0 +1,34 @@
+"""
+异步评估回调：训练中途出错时评估进程不会泄漏
+"""
+import pytest
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
+
+from env import DecisionEnv
+from eval_callback import AsyncEvalCallback
+
+
+class _FailAt(BaseCallback):
+    def __init__(self, step):
+        super().__init__()
+        self.step = step
+
+    def _on_step(self):
+        if self.num_timesteps >= self.step:
+            raise RuntimeError("training failed")
+        return True
+
+
+def test_eval_pool_closed_after_failed_training(tmp_path):
+    model = PPO("MlpPolicy", DecisionEnv(), n_steps=64, batch_size=64, seed=0)
+    callback = AsyncEvalCallback(eval_freq=64, eval_episodes=20, best_model_path=str(tmp_path / "best.npz"))
+    with pytest.raises(RuntimeError):
+        model.learn(256, callback=CallbackList([callback, _FailAt(200)]))
+    processes = list(callback._pool._processes.values())
+    assert processes
+    callback.close()
+    for process in processes:
+        process.join(timeout=30)
+        assert not process.is_alive()
+    callback.close()
@@ -0,0 +1,32 @@
+"""
+插桩模式：奖励与普通 step 逐位相同，各项之和等于奖励，info 中的数组可以跨步保存
+"""
+import numpy as np
+
+from env import DecisionEnv
+
+
+def test_instrumented_step_matches_step():
+    env, instrumented = DecisionEnv(), DecisionEnv(instrument=True)
+    rng = np.random.default_rng(0)
+    infos, total = [], 0.0
+    for episode in range(20):
+        env.reset(seed=episode)
+        instrumented.reset(seed=episode)
+        for _ in range(200):
+            action = 3 if rng.random() < 0.7 else int(rng.integers(0, 4))
+            _, reward, terminated, truncated, _ = env.step(action)
+            _, instrumented_reward, _, _, info = instrumented.step(action)
+            assert instrumented_reward == reward
+            np.testing.assert_allclose(info["reward_terms"].sum(), reward, rtol=1e-5, atol=1e-4)
+            infos.append(info)
+            total += reward
+            if terminated or truncated:
+                break
+
+    assert infos[0]["reward_terms"] is not infos[-1]["reward_terms"]
+    np.testing.assert_allclose(sum(info["reward_terms"] for info in infos), infos[-1]["reward_term_sums"])
+    stats = instrumented.reward_stats()
+    assert stats["steps"] == infos[-1]["instrumented_steps"] == len(infos)
+    assert stats["step_time_ns"] == infos[-1]["step_time_ns"] > 0
+    np.testing.assert_allclose(stats["reward_term_sums"].sum(), total, rtol=1e-5)
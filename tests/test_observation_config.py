@@ -0,0 +1,31 @@
+"""
+观察配置随策略保存：PPO检查点和导出的 .npz 都带有 obs_mode / normalize_obs，
+run_episodes 默认按保存的配置转换观察
+"""
+import numpy as np
+from stable_baselines3 import PPO
+
+from env import DecisionEnv
+from numpy_policy import export_policy, load_policy, observation_config
+from rollout import run_episodes
+
+
+def test_observation_config_round_trip(tmp_path):
+    model = PPO("MlpPolicy", DecisionEnv(obs_mode="egocentric", normalize_obs=True), seed=0)
+    model.obs_mode = "egocentric"
+    model.normalize_obs = True
+    model_path = str(tmp_path / "model")
+    model.save(model_path)
+
+    loaded = load_policy(model_path, cache=False)
+    assert observation_config(loaded) == ("egocentric", True)
+    exported = load_policy(export_policy(model_path, str(tmp_path / "model.npz")), cache=False)
+    assert observation_config(exported) == ("egocentric", True)
+
+    expected = run_episodes(loaded, 50, seed=0, obs_mode="egocentric", normalize_obs=True)
+    np.testing.assert_array_equal(run_episodes(loaded, 50, seed=0).actions, expected.actions)
+    np.testing.assert_array_equal(run_episodes(exported, 50, seed=0).actions, expected.actions)
+
+
+def test_policy_without_config_uses_absolute_observations():
+    assert observation_config(object()) == ("absolute", False)
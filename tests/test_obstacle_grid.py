@@ -0,0 +1,45 @@
+"""
+ObstacleGrid 的最近障碍物查询：查询半径内没有障碍物时按圈扩大范围查找，结果与检查全部障碍物相同；
+point_nearest 返回的其余障碍物距离下界不超过真实的第二近距离
+"""
+import numpy as np
+import pytest
+
+from obstacle_grid import ObstacleGrid
+
+
+def _random_grid(num_groups, num_obstacles, seed):
+    rng = np.random.default_rng(seed)
+    grid = ObstacleGrid(num_groups, num_obstacles)
+    grid.build(np.arange(num_groups), rng.uniform(-100, 100, size=(num_groups, num_obstacles, 2)))
+    # 查询点包括网格外的点
+    points = rng.uniform(-130, 130, size=(num_groups, 2)).astype(np.float32)
+    return grid, points
+
+
+def _sorted_dist2(grid, points):
+    offset = grid.positions - points[:, None]
+    return np.sort((offset * offset).sum(axis=2), axis=1)
+
+
+@pytest.mark.parametrize("num_obstacles", [1, 2, 5, 200])
+def test_nearest_matches_full_scan(num_obstacles):
+    grid, points = _random_grid(500, num_obstacles, seed=num_obstacles)
+    nearest = grid.nearest(points)
+    dist2 = ((nearest - points) ** 2).sum(axis=1)
+    np.testing.assert_allclose(dist2, _sorted_dist2(grid, points)[:, 0], rtol=1e-6)
+
+
+@pytest.mark.parametrize("num_obstacles", [1, 2, 5, 200])
+def test_point_nearest_matches_full_scan(num_obstacles):
+    grid, points = _random_grid(200, num_obstacles, seed=num_obstacles)
+    expected = _sorted_dist2(grid, points)
+    for g, (x, y) in enumerate(points.tolist()):
+        # 奇数组传入Python列表形式的 cell_start（同 DecisionEnv）
+        cell_start = grid.cell_start[g].tolist() if g % 2 else None
+        nearest, runner_up = grid.point_nearest(x, y, group=g, cell_start=cell_start)
+        assert ((nearest - points[g]) ** 2).sum() == pytest.approx(expected[g, 0], rel=1e-6)
+        if num_obstacles > 1:
+            assert runner_up ** 2 <= expected[g, 1] * (1 + 1e-6)
+        else:
+            assert runner_up == np.inf
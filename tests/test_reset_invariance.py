@@ -0,0 +1,137 @@
+"""
+重置不变性：同一个种子下，新建的环境和已经运行过很多episode的环境给出完全相同的奖励序列；
+每个episode的奖励只取决于场景和动作，与环境之前运行过什么无关
+长期运行的向量化环境（工作进程中的环境会被重置上百万次）尤其依赖这一点
+"""
+import numpy as np
+import pytest
+
+from batch_env import BatchDecisionEnv
+from env import DecisionEnv
+from scenario_bank import ScenarioBank
+from vec_env import DecisionVecEnv, SubprocDecisionVecEnv
+
+
+def _run_scalar(env, seed, actions):
+    """从 reset(seed) 开始执行 actions，episode结束后不带种子重置，返回奖励序列"""
+    env.reset(seed=seed)
+    rewards = []
+    for action in actions:
+        _, reward, terminated, truncated, _ = env.step(int(action))
+        rewards.append(reward)
+        if terminated or truncated:
+            env.reset()
+    return np.array(rewards, dtype=np.float32)
+
+
+def _run_vec(venv, actions):
+    """venv 已重置，执行 (步数, 环境数) 的动作，返回 (步数, 环境数) 的奖励"""
+    return np.stack([venv.step(step_actions)[1] for step_actions in actions])
+
+
+def _actions(seed, shape):
+    """偏向朝目标（+x）的随机动作，能覆盖到达、碰撞和超时"""
+    rng = np.random.default_rng(seed)
+    return np.where(rng.random(shape) < 0.7, 3, rng.integers(0, 4, shape))
+
+
+def _use(env, seed):
+    """用另一个种子运行一段，并在episode中途停下"""
+    _run_scalar(env, seed, _actions(seed, 1234))
+
+
+@pytest.mark.parametrize("seed", [0, 7, 123])
+def test_scalar_fresh_and_reused_env_match(seed):
+    actions = _actions(seed, 2000)
+    expected = _run_scalar(DecisionEnv(), seed, actions)
+    reused = DecisionEnv()
+    for other in range(3):
+        _use(reused, seed + 1000 + other)
+    np.testing.assert_array_equal(_run_scalar(reused, seed, actions), expected)
+
+
+def test_scalar_episode_depends_only_on_scenario():
+    env = DecisionEnv()
+    env.reset(seed=5)
+    actions = _actions(5, (30, 200))
+    for episode_actions in actions:
+        scenario = ScenarioBank(env.destination[None].copy(), env.obs_pos[None].copy())
+        rewards = []
+        for action in episode_actions:
+            _, reward, terminated, truncated, _ = env.step(int(action))
+            rewards.append(reward)
+            if terminated or truncated:
+                break
+        env.reset()
+
+        fresh = DecisionEnv(scenario_bank=scenario)
+        fresh.reset(options={"scenario_id": 0})
+        expected = [fresh.step(int(action))[1] for action in episode_actions[:len(rewards)]]
+        np.testing.assert_array_equal(rewards, expected)
+
+
+def test_batch_env_fresh_and_reused_match():
+    actions = _actions(1, (400, 64))
+    fresh = BatchDecisionEnv(64)
+    fresh.reset(seed=1)
+    expected = _run_vec(fresh, actions)
+
+    reused = BatchDecisionEnv(64)
+    reused.reset(seed=2)
+    _run_vec(reused, _actions(2, (333, 64)))
+    reused.reset(seed=1)
+    np.testing.assert_array_equal(_run_vec(reused, actions), expected)
+
+
+def test_batch_env_episode_depends_only_on_scenario():
+    env = BatchDecisionEnv(16)
+    env.reset(seed=3)
+    actions = _actions(3, (600, 16))
+    # 槽位 0 中先后运行的每个episode：(场景, 动作, 奖励)
+    episodes = []
+    scenario = (env.destination[0].copy(), env.obs_pos[0].copy())
+    episode_actions, episode_rewards = [], []
+    for step_actions in actions:
+        _, rewards, dones, _ = env.step(step_actions)
+        episode_actions.append(step_actions[0])
+        episode_rewards.append(rewards[0])
+        if dones[0]:
+            episodes.append((scenario, episode_actions, episode_rewards))
+            scenario = (env.destination[0].copy(), env.obs_pos[0].copy())
+            episode_actions, episode_rewards = [], []
+    assert len(episodes) >= 3
+
+    for (destination, obs_pos), episode_actions, episode_rewards in episodes:
+        fresh = BatchDecisionEnv(1, scenario_bank=ScenarioBank(destination[None], obs_pos[None]))
+        fresh.reset()
+        expected = [fresh.step([action])[1][0] for action in episode_actions]
+        np.testing.assert_array_equal(episode_rewards, expected)
+
+
+def test_decision_vec_env_reseed_matches():
+    actions = _actions(4, (400, 32))
+    venv = DecisionVecEnv(32)
+    venv.seed(4)
+    venv.reset()
+    expected = _run_vec(venv, actions)
+    venv.seed(4)
+    venv.reset()
+    np.testing.assert_array_equal(_run_vec(venv, actions), expected)
+
+
+def test_subproc_vec_env_matches_fresh_scalar_envs():
+    actions = _actions(6, (400, 4))
+    venv = SubprocDecisionVecEnv(2, envs_per_worker=2, seed=6)
+    try:
+        venv.reset()
+        first = _run_vec(venv, actions)
+        # 工作进程中的环境已被重复使用，重新设置相同的种子后结果不变
+        venv.seed(6)
+        venv.reset()
+        second = _run_vec(venv, actions)
+    finally:
+        venv.close()
+    np.testing.assert_array_equal(second, first)
+    # 第 i 个环境使用种子 6 + i，与单独新建的环境逐步相同
+    for i in range(4):
+        np.testing.assert_array_equal(first[:, i], _run_scalar(DecisionEnv(), 6 + i, actions[:, i]))
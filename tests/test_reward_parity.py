@@ -0,0 +1,120 @@
+"""
+奖励实现的一致性：DecisionEnv 的单障碍物和多障碍物 step（reward.scalar_reward）与向量化的
+reward.compute_rewards 对同一转移给出相同的奖励（浮点舍入误差以内）和终止标志
+多障碍物时 compute_rewards 对全部障碍物计算，同时检查网格索引没有遗漏附近的障碍物；
+非默认的奖励配置（如紧急半径大于避障半径）下直接比较 scalar_reward 和 compute_rewards，
+以及障碍物各项逐个计算和向量化计算（obstacle_sums）的结果
+"""
+import numpy as np
+import pytest
+
+from env import ACTION_AXIS, ACTION_DIRS, ACTION_SIGN, DecisionEnv, _norm2
+from reward import compute_rewards, obstacle_sums, scalar_reward, scalar_reward_params
+
+
+def _replay(env, obstacles, seed, num_episodes=20):
+    """用偏向目标的随机动作运行 env，每一步与 compute_rewards 比较；obstacles(env) 返回当前episode的全部障碍物"""
+    rng = np.random.default_rng(seed)
+    outcomes = set()
+    for episode in range(num_episodes):
+        env.reset(seed=seed + episode)
+        obs_all = obstacles(env)
+        dest = env.destination.copy()
+        initial_dist = last_dist = np.linalg.norm(dest)
+        for _ in range(200):
+            action = 3 if rng.random() < 0.7 else int(rng.integers(0, 4))
+            _, reward, terminated, truncated, _ = env.step(action)
+            expected, dist, arrived, collided = compute_rewards(
+                env.ego_pos[None], dest[None], obs_all, [action], [last_dist], [initial_dist],
+                obs_rows=np.zeros(len(obs_all), dtype=np.int64))
+            np.testing.assert_allclose(reward, expected[0], rtol=1e-5, atol=1e-4)
+            assert terminated == bool(arrived[0] or collided[0])
+            last_dist = dist[0]
+            if terminated or truncated:
+                outcomes.add("collision" if collided[0] else "arrival" if arrived[0] else "truncated")
+                break
+    return outcomes
+
+
+@pytest.mark.parametrize("seed", [0, 100, 200])
+def test_scalar_step_matches_compute_rewards(seed):
+    outcomes = _replay(DecisionEnv(), lambda env: env.obs_pos[None].copy(), seed)
+    assert outcomes
+
+
+@pytest.mark.parametrize("num_obstacles", [2, 30, 300])
+def test_multi_obstacle_step_matches_compute_rewards(num_obstacles):
+    def obstacles(env):
+        return env.obstacles.positions[0].copy()
+
+    _replay(DecisionEnv(num_obstacles=num_obstacles), obstacles, seed=num_obstacles)
+
+
+@pytest.mark.parametrize("num_obstacles", [2, 50])
+def test_multi_obstacle_obs_pos_is_nearest(num_obstacles):
+    env = DecisionEnv(num_obstacles=num_obstacles)
+    env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        _, _, terminated, truncated, _ = env.step(3 if rng.random() < 0.6 else int(rng.integers(0, 4)))
+        if terminated or truncated:
+            env.reset()
+            continue
+        offset = env.obstacles.positions[0] - env.ego_pos
+        dist2 = (offset * offset).sum(axis=1)
+        assert ((env.obs_pos - env.ego_pos) ** 2).sum() == pytest.approx(dist2.min())
+
+
+@pytest.mark.parametrize("config", [
+    {"emergency_radius": 20.0, "avoidance_radius": 10.0},
+    {"warning_radius": 30.0, "collision_radius": 3.0, "arrival_radius": 12.0, "direction_weight": 0.0},
+])
+@pytest.mark.parametrize("num_obstacles", [1, 4])
+def test_scalar_reward_matches_compute_rewards_with_config(config, num_obstacles):
+    rng = np.random.default_rng(num_obstacles)
+    n = 5000
+    before = rng.uniform(-10, 70, size=(n, 2)).astype(np.float32)
+    action = rng.integers(0, 4, n)
+    ego = before + ACTION_DIRS[action]
+    dest = rng.uniform(50, 80, size=(n, 2)).astype(np.float32) * np.float32([1.0, 0.1])
+    # 障碍物在ego附近（覆盖各个半径），第 j 个属于第 rows[j] 行
+    rows = np.repeat(np.arange(n), num_obstacles)
+    obs = (ego[rows] + rng.uniform(-25, 25, size=(len(rows), 2))).astype(np.float32)
+    last_dist = np.linalg.norm(dest - before, axis=1)
+    initial_dist = np.linalg.norm(dest, axis=1)
+
+    expected, _, arrived, collided = compute_rewards(ego, dest, obs, action, last_dist, initial_dist,
+                                                     config=config, obs_rows=rows)
+    params = scalar_reward_params(config)
+    for i in range(n):
+        to_dest = (dest[i, 0] - ego[i, 0], dest[i, 1] - ego[i, 1])
+        obstacles = []
+        for obs_x, obs_y in obs[rows == i]:
+            to_obs = (obs_x - ego[i, 0], obs_y - ego[i, 1])
+            obstacles.append((to_obs, _norm2(*to_obs)))
+        reward, scalar_arrived, scalar_collided = scalar_reward(
+            params, ACTION_AXIS[action[i]], ACTION_SIGN[action[i]], to_dest, _norm2(*to_dest), last_dist[i],
+            initial_dist[i], obstacles)
+        np.testing.assert_allclose(reward, expected[i], rtol=1e-5, atol=1e-4)
+        assert (scalar_arrived, scalar_collided) == (bool(arrived[i]), bool(collided[i]))
+
+
+@pytest.mark.parametrize("config", [
+    None,
+    {"emergency_radius": 20.0, "avoidance_radius": 10.0},
+    {"avoidance_radius": 0.0, "emergency_radius": 0.0},
+])
+def test_obstacle_sums_matches_scalar_obstacles(config):
+    rng = np.random.default_rng(0)
+    params = scalar_reward_params(config)
+    for _ in range(500):
+        axis, sign = int(rng.integers(0, 2)), float(rng.choice([-1.0, 1.0]))
+        to_obs = rng.uniform(-25, 25, size=(int(rng.integers(1, 60)), 2)).astype(np.float32)
+        dist_to_obs = np.sqrt((to_obs * to_obs).sum(axis=1))
+        args = (params, axis, sign, (np.float32(30.0), np.float32(2.0)), np.float32(30.1), np.float32(31.0),
+                np.float32(60.0))
+        reward, arrived, collided = scalar_reward(*args, list(zip(to_obs, dist_to_obs)))
+        totals = obstacle_sums(params, axis, sign, to_obs, dist_to_obs)
+        vectorized, vectorized_arrived, vectorized_collided = scalar_reward(*args, (), obstacle_totals=totals)
+        np.testing.assert_allclose(vectorized, reward, rtol=1e-5, atol=1e-4)
+        assert (vectorized_arrived, vectorized_collided) == (arrived, collided)
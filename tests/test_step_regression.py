@@ -0,0 +1,122 @@
+"""
+DecisionEnv.step 的回归测试：把同一组动作序列同时回放给原始实现（下面冻结的副本）和当前的 step，
+逐步比较奖励、终止标志和观察，要求完全一致
+"""
+import numpy as np
+import pytest
+
+from env import DecisionEnv
+
+
+class _OriginalState:
+    """原始 step 读写的环境状态"""
+
+    def __init__(self, env):
+        self.step_size = 1.0
+        self.ego_pos = np.array([0.0, 0.0], dtype=np.float32)
+        self.destination = env.destination.copy()
+        self.obs_pos = env.obs_pos.copy()
+        # 原始实现在第一次 step 时懒初始化这两个值（跨episode沿用是已修复的bug），这里按episode初始化
+        self.initial_dist_to_dest = np.linalg.norm(self.destination)
+        self.last_dist_to_dest = self.initial_dist_to_dest
+
+
+def _original_step(self, action):
+    """冻结的原始 DecisionEnv.step（只去掉了懒初始化），返回 (reward, terminated)"""
+    reward = -0.01
+    terminated = False
+
+    if action == 0:
+        self.ego_pos += np.array([0.0, self.step_size], dtype=np.float32)
+    elif action == 1:
+        self.ego_pos += np.array([0.0, -self.step_size], dtype=np.float32)
+    elif action == 2:
+        self.ego_pos += np.array([-self.step_size, 0.0], dtype=np.float32)
+    elif action == 3:
+        self.ego_pos += np.array([self.step_size, 0.0], dtype=np.float32)
+
+    dist_to_dest = np.linalg.norm(self.destination - self.ego_pos)
+    dist_to_obs = np.linalg.norm(self.obs_pos - self.ego_pos)
+
+    progress = self.last_dist_to_dest - dist_to_dest
+    reward += progress * 2.0
+    self.last_dist_to_dest = dist_to_dest
+
+    normalized_dist = dist_to_dest / (self.initial_dist_to_dest + 1e-6)
+    if normalized_dist > 1.0:
+        distance_reward = -(normalized_dist - 1.0) * 2.0
+    else:
+        distance_reward = (1.0 - normalized_dist) ** 2 * 1.0
+    reward += distance_reward
+
+    action_dirs = {
+        0: np.array([0.0, 1.0]),
+        1: np.array([0.0, -1.0]),
+        2: np.array([-1.0, 0.0]),
+        3: np.array([1.0, 0.0]),
+    }
+    to_dest = self.destination - self.ego_pos
+    to_dest_norm = np.linalg.norm(to_dest)
+    if to_dest_norm > 1e-6:
+        direction_alignment = np.dot(action_dirs[action], to_dest / to_dest_norm)
+        if direction_alignment > 0:
+            reward += direction_alignment * 0.5
+
+    if dist_to_obs < 25.0:
+        reward -= (25.0 - dist_to_obs) / 10.0 * 1.5
+
+    if dist_to_obs < 15.0:
+        to_obs = self.obs_pos - self.ego_pos
+        to_obs_norm = np.linalg.norm(to_obs)
+        if to_obs_norm > 1e-6:
+            avoidance_alignment = -np.dot(action_dirs[action], to_obs / to_obs_norm)
+            if avoidance_alignment > 0:
+                reward += avoidance_alignment * (15.0 - dist_to_obs) / 15.0 * 2.0
+            elif avoidance_alignment < 0:
+                reward -= -avoidance_alignment * (15.0 - dist_to_obs) / 15.0 * 1.5
+
+    if dist_to_obs < 8.0:
+        to_obs = self.obs_pos - self.ego_pos
+        to_obs_norm = np.linalg.norm(to_obs)
+        if to_obs_norm > 1e-6:
+            avoidance_alignment = -np.dot(action_dirs[action], to_obs / to_obs_norm)
+            if avoidance_alignment > 0:
+                reward += avoidance_alignment * (8.0 - dist_to_obs) / 8.0 * 3.0
+            elif avoidance_alignment < 0:
+                reward -= -avoidance_alignment * (8.0 - dist_to_obs) / 8.0 * 2.5
+
+    if dist_to_dest < 8.0:
+        reward += 100.0
+        terminated = True
+
+    if dist_to_obs < 2.0:
+        reward -= 200.0
+        terminated = True
+
+    return reward, terminated
+
+
+def _actions(rng):
+    """偏向朝目标（+x）的随机动作序列，能覆盖到达、碰撞和超时"""
+    p = rng.random()
+    return [3 if rng.random() < p else int(rng.integers(0, 4)) for _ in range(200)]
+
+
+@pytest.mark.parametrize("seed", range(0, 300, 30))
+def test_step_matches_original(seed):
+    env = DecisionEnv()
+    rng = np.random.default_rng(seed)
+    outcomes = set()
+    for episode in range(30):
+        env.reset(seed=seed + episode)
+        original = _OriginalState(env)
+        for action in _actions(rng):
+            obs, reward, terminated, truncated, _ = env.step(action)
+            expected_reward, expected_terminated = _original_step(original, action)
+            assert np.float32(reward) == np.float32(expected_reward)
+            assert terminated == expected_terminated
+            np.testing.assert_array_equal(obs[0:2], original.ego_pos)
+            if terminated or truncated:
+                outcomes.add("terminated" if terminated else "truncated")
+                break
+    assert outcomes
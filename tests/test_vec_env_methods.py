@@ -0,0 +1,72 @@
+"""
+VecEnv 的 get_attr / set_attr / env_method 按槽位（环境）操作，只影响指定的索引
+"""
+import numpy as np
+import pytest
+
+from vec_env import DecisionVecEnv, SubprocDecisionVecEnv
+
+
+def test_decision_vec_env_attrs_are_per_slot():
+    venv = DecisionVecEnv(4, seed=0)
+    venv.reset()
+    for _ in range(3):
+        venv.step(np.full(4, 3))
+    assert [int(s) for s in venv.get_attr("elapsed_steps")] == [3, 3, 3, 3]
+    np.testing.assert_array_equal(venv.get_attr("destination", [2])[0], venv.destination[2])
+    assert venv.get_attr("step_size", [0, 1]) == [1.0, 1.0]
+
+    venv.set_attr("elapsed_steps", 7, indices=[1])
+    assert list(venv.elapsed_steps) == [3, 7, 3, 3]
+    with pytest.raises(ValueError):
+        venv.set_attr("step_size", 2.0, indices=[0])
+    venv.set_attr("render_mode", None)
+
+
+def test_decision_vec_env_reset_only_requested_slots():
+    venv = DecisionVecEnv(4, seed=0)
+    venv.reset()
+    for _ in range(3):
+        venv.step(np.full(4, 3))
+    destination = venv.destination.copy()
+    results = venv.env_method("reset", indices=[0, 2])
+    assert len(results) == 2
+    assert list(venv.elapsed_steps) == [0, 3, 0, 3]
+    np.testing.assert_array_equal(venv.ego_pos[[0, 2]], 0.0)
+    np.testing.assert_array_equal(venv.destination[[1, 3]], destination[[1, 3]])
+    assert not np.array_equal(venv.destination[[0, 2]], destination[[0, 2]])
+    with pytest.raises(NotImplementedError):
+        venv.env_method("render")
+
+
+def test_subproc_vec_env_forwards_to_worker_envs():
+    venv = SubprocDecisionVecEnv(2, envs_per_worker=2, seed=0)
+    try:
+        venv.reset()
+        for _ in range(3):
+            obs = venv.step(np.full(4, 3))[0]
+        assert venv.get_attr("elapsed_steps") == [3, 3, 3, 3]
+        destination = venv.get_attr("destination", [3, 0])
+        np.testing.assert_array_equal(destination[0], obs[3, 2:4])
+        np.testing.assert_array_equal(destination[1], obs[0, 2:4])
+
+        venv.set_attr("step_size", 2.0, indices=[1, 2])
+        assert venv.get_attr("step_size") == [1.0, 2.0, 2.0, 1.0]
+        results = venv.env_method("reset", indices=[2])
+        assert len(results) == 1 and results[0][0].shape == (6,)
+        assert venv.get_attr("elapsed_steps", [2]) == [0]
+    finally:
+        venv.close()
+
+
+def test_subproc_vec_env_reports_worker_errors():
+    venv = SubprocDecisionVecEnv(2, envs_per_worker=1, seed=0)
+    try:
+        venv.reset()
+        with pytest.raises(AttributeError):
+            venv.get_attr("no_such_attribute")
+        # 工作进程仍然可用
+        assert venv.get_attr("max_episode_steps") == [200, 200]
+        venv.step(np.zeros(2, dtype=np.int64))
+    finally:
+        venv.close()
@@ -1,23 +1,112 @@
+"""
+训练PPO模型
+- 默认：单个 DecisionEnv
+- 多进程：python train.py --workers K --envs-per-worker M
+"""
+import argparse
+import math
+
 from stable_baselines3 import PPO
-from env import DecisionEnv
-
-env = DecisionEnv()
-
-model = PPO(
-    "MlpPolicy",
-    env,
-    verbose=1,
-    n_steps=512,
-    batch_size=64,
-    learning_rate=3e-4,
-    ent_coef=0.01,  # 增加探索率，鼓励尝试避障动作
-    gamma=0.99,  # 折扣因子，重视长期奖励
-    gae_lambda=0.95,  # GAE lambda，平衡偏差和方差
-    clip_range=0.2,  # PPO clip range
-    vf_coef=0.5,  # 价值函数系数
-    max_grad_norm=0.5  # 梯度裁剪
-)
-
-# 增加训练时间，让模型更好地学习避障策略
-model.learn(total_timesteps=300_000)  # 从200k增加到300k
-model.save("ppo_decision")
+from stable_baselines3.common.vec_env import VecMonitor
+from behavior_cloning import pretrain
+from env import MAX_EPISODE_STEPS, DecisionEnv
+from eval_callback import AsyncEvalCallback
+from vec_env import SubprocDecisionVecEnv
+
+
+def make_env(workers=0, envs_per_worker=1, seed=None, max_episode_steps=MAX_EPISODE_STEPS, normalize_obs=False,
+             obs_mode="absolute", num_obstacles=1):
+    """
+    workers为0时使用单个环境，否则启动workers个进程，每个进程运行envs_per_worker个环境
+    超过 max_episode_steps 的episode被截断，避免在远离目标的轨迹上浪费样本
+    """
+    if workers <= 0:
+        return DecisionEnv(max_episode_steps=max_episode_steps, normalize_obs=normalize_obs, obs_mode=obs_mode,
+                           num_obstacles=num_obstacles)
+    # VecMonitor 记录每个episode的奖励和长度（rollout/ep_rew_mean 等日志），单个环境由PPO自动包装 Monitor
+    return VecMonitor(SubprocDecisionVecEnv(workers, envs_per_worker, seed=seed, max_episode_steps=max_episode_steps,
+                                            normalize_obs=normalize_obs, obs_mode=obs_mode,
+                                            num_obstacles=num_obstacles))
+
+
+def train(workers=0, envs_per_worker=1, seed=None, total_timesteps=300_000, max_episode_steps=MAX_EPISODE_STEPS,
+          n_steps=None, batch_size=64, learning_rate=3e-4, ent_coef=0.01, save_path="ppo_decision", verbose=1,
+          eval_freq=0, eval_episodes=1000, stop_success_rate=None, pretrain_dataset=None, pretrain_epochs=5,
+          normalize_obs=False, obs_mode="absolute", net_arch=None, num_obstacles=1):
+    """
+    pretrain_dataset 不为None时，PPO训练前先用该行为克隆数据集（behavior_cloning.py生成）预训练策略网络
+    eval_freq > 0 时每隔 eval_freq 步在独立进程中异步评估一次（见 eval_callback.AsyncEvalCallback），
+    最好的快照保存为 {save_path}_best.npz；成功率达到 stop_success_rate 时提前停止
+    obs_mode="egocentric" 时观察为相对ego的向量和距离，可配合较小的 net_arch（如 [32, 32]）
+    net_arch 为None时使用SB3默认的网络结构
+    num_obstacles > 1 时在多障碍物场景中训练（观察中为最近的障碍物）；评估回调仍使用单障碍物场景库
+    """
+    env = make_env(workers, envs_per_worker, seed, max_episode_steps, normalize_obs, obs_mode, num_obstacles)
+    n_envs = workers * envs_per_worker if workers > 0 else 1
+    # 多环境时按环境数缩短每个环境的rollout长度，保持每次更新的样本量约为512，
+    # 并取整使样本量 n_steps * n_envs 是 batch_size 的整数倍（否则最后一个minibatch不完整）
+    if n_steps is None:
+        unit = batch_size // math.gcd(batch_size, n_envs)
+        n_steps = max(round(max(512 // n_envs, 16) / unit), 1) * unit
+
+    model = PPO(
+        "MlpPolicy",
+        env,
+        verbose=verbose,
+        n_steps=n_steps,
+        batch_size=batch_size,
+        learning_rate=learning_rate,
+        ent_coef=ent_coef,  # 增加探索率，鼓励尝试避障动作
+        gamma=0.99,  # 折扣因子，重视长期奖励
+        gae_lambda=0.95,  # GAE lambda，平衡偏差和方差
+        clip_range=0.2,  # PPO clip range
+        vf_coef=0.5,  # 价值函数系数
+        max_grad_norm=0.5,  # 梯度裁剪
+        seed=seed,
+        policy_kwargs=None if net_arch is None else dict(net_arch=list(net_arch)),
+    )
+    # 观察配置随检查点保存，评估和导出时按此转换观察（见 numpy_policy.observation_config）
+    model.obs_mode = obs_mode
+    model.normalize_obs = normalize_obs
+
+    if pretrain_dataset is not None:
+        pretrain(model, pretrain_dataset, epochs=pretrain_epochs, seed=0 if seed is None else seed, verbose=verbose,
+                 normalize_obs=normalize_obs, obs_mode=obs_mode)
+
+    callback = None
+    if eval_freq > 0:
+        callback = AsyncEvalCallback(eval_freq, eval_episodes, best_model_path=f"{save_path}_best.npz",
+                                     stop_success_rate=stop_success_rate, normalize_obs=normalize_obs,
+                                     obs_mode=obs_mode, verbose=verbose)
+    try:
+        model.learn(total_timesteps=total_timesteps, callback=callback)
+    finally:
+        # 训练出错时也关闭评估进程和环境进程
+        if callback is not None:
+            callback.close()
+        env.close()
+    model.save(save_path)
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="训练PPO模型")
+    parser.add_argument("--workers", type=int, default=0, help="工作进程数（0为单进程单环境）")
+    parser.add_argument("--envs-per-worker", type=int, default=1, help="每个工作进程中的环境数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--timesteps", type=int, default=300_000, help="总训练步数")
+    parser.add_argument("--max-episode-steps", type=int, default=MAX_EPISODE_STEPS, help="episode步数上限")
+    parser.add_argument("--eval-freq", type=int, default=0, help="异步评估间隔步数（0为不评估）")
+    parser.add_argument("--eval-episodes", type=int, default=1000, help="每次评估的场景数")
+    parser.add_argument("--stop-success-rate", type=float, default=None, help="评估成功率达到该值时提前停止")
+    parser.add_argument("--pretrain", default=None, help="行为克隆数据集（先预训练再PPO训练）")
+    parser.add_argument("--pretrain-epochs", type=int, default=5, help="预训练轮数")
+    parser.add_argument("--normalize-obs", action="store_true", help="使用归一化观察")
+    parser.add_argument("--obs-mode", choices=["absolute", "egocentric"], default="absolute", help="观察模式")
+    parser.add_argument("--num-obstacles", type=int, default=1, help="每个环境的障碍物数")
+    parser.add_argument("--net-arch", type=int, nargs="+", default=None, help="策略/价值网络的隐藏层大小，如 32 32")
+    args = parser.parse_args()
+    train(args.workers, args.envs_per_worker, args.seed, args.timesteps, args.max_episode_steps,
+          eval_freq=args.eval_freq, eval_episodes=args.eval_episodes, stop_success_rate=args.stop_success_rate,
+          pretrain_dataset=args.pretrain, pretrain_epochs=args.pretrain_epochs, normalize_obs=args.normalize_obs,
+          obs_mode=args.obs_mode, net_arch=args.net_arch, num_obstacles=args.num_obstacles)
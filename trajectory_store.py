@@ -0,0 +1,112 @@
+"""
+列式轨迹数据集（磁盘存储）
+每一列是一个原始二进制文件，按块追加写入，读取时用 np.memmap 映射，不需要把全部数据载入内存
+
+目录结构:
+    meta.json           版本和行数
+    positions.bin       (轨迹点数, 2) float32，包含每个episode的初始位置
+    actions.bin         (总步数,) int8
+    rewards.bin         (总步数,) float32
+    step_offsets.bin    (episode数 + 1,) int64
+    destination.bin     (episode数, 2) float32
+    obs_pos.bin         (episode数, 2) float32
+    total_reward.bin    (episode数,) float64
+    outcome.bin         (episode数,) int8
+"""
+import json
+import os
+
+import numpy as np
+
+from rollout import RolloutResult, chunk_seeds, run_episodes
+
+FORMAT_VERSION = 1
+
+# 列名 -> (dtype, 每行的列数)
+COLUMNS = {
+    "positions": (np.float32, 2),
+    "actions": (np.int8, 1),
+    "rewards": (np.float32, 1),
+    "destination": (np.float32, 2),
+    "obs_pos": (np.float32, 2),
+    "total_reward": (np.float64, 1),
+    "outcome": (np.int8, 1),
+}
+
+
+class TrajectoryWriter:
+    """按块追加 RolloutResult 到数据集目录"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in COLUMNS}
+        self._offsets = open(os.path.join(path, "step_offsets.bin"), "wb")
+        self._offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+        self.num_episodes = 0
+        self.num_steps = 0
+
+    def append(self, result):
+        """追加一块episode（RolloutResult）"""
+        for name, (dtype, _) in COLUMNS.items():
+            self._files[name].write(np.ascontiguousarray(getattr(result, name), dtype=dtype).tobytes())
+        offsets = np.asarray(result.step_offsets[1:], dtype=np.int64) + self.num_steps
+        self._offsets.write(offsets.tobytes())
+        self.num_episodes += result.num_episodes
+        self.num_steps += int(result.step_offsets[-1])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._offsets.close()
+        meta = {
+            "version": FORMAT_VERSION,
+            "num_episodes": self.num_episodes,
+            "num_steps": self.num_steps,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _map_column(path, name, dtype, rows, width, mmap):
+    file_path = os.path.join(path, f"{name}.bin")
+    shape = (rows, width) if width > 1 else (rows,)
+    if not mmap or rows == 0:
+        return np.fromfile(file_path, dtype=dtype).reshape(shape)
+    return np.memmap(file_path, dtype=dtype, mode="r", shape=shape)
+
+
+def load_trajectories(path, mmap=True):
+    """读取数据集，返回 RolloutResult；mmap=True时各列为只读的 np.memmap"""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"不支持的数据集版本: {meta['version']}")
+    num_episodes, num_steps = meta["num_episodes"], meta["num_steps"]
+    rows = {
+        "positions": num_steps + num_episodes,
+        "actions": num_steps,
+        "rewards": num_steps,
+    }
+    columns = {
+        name: _map_column(path, name, dtype, rows.get(name, num_episodes), width, mmap)
+        for name, (dtype, width) in COLUMNS.items()
+    }
+    step_offsets = np.fromfile(os.path.join(path, "step_offsets.bin"), dtype=np.int64)
+    return RolloutResult(step_offsets=step_offsets, **columns)
+
+
+def run_to_store(model, path, num_episodes, chunk_episodes=10_000, num_envs=1024, seed=None):
+    """分块运行 num_episodes 个episode并写入数据集，内存占用只与 chunk_episodes 有关"""
+    with TrajectoryWriter(path) as writer:
+        starts = range(0, num_episodes, chunk_episodes)
+        for start, chunk_seed in zip(starts, chunk_seeds(seed, len(starts))):
+            n = min(chunk_episodes, num_episodes - start)
+            writer.append(run_episodes(model, n, num_envs=num_envs, seed=chunk_seed))
+    return path
@@ -0,0 +1,277 @@
+"""
+DecisionEnv 的向量化版本（SB3 VecEnv 接口）
+- DecisionVecEnv: 原生批量版本，见 batch_env.BatchDecisionEnv
+- SubprocDecisionVecEnv: 多进程版本，K 个工作进程各运行若干个 DecisionEnv，观察通过共享内存返回
+两者都不记录episode统计，用于训练时需包装 VecMonitor（见 train.make_env），否则没有 rollout/ep_rew_mean 日志
+"""
+import multiprocessing as mp
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from batch_env import BatchDecisionEnv
+from env import MAX_EPISODE_STEPS, DecisionEnv, observation_space
+
+
+class DecisionVecEnv(BatchDecisionEnv, VecEnv):
+    """
+    批量决策环境（SB3 VecEnv 接口），计算由 BatchDecisionEnv 完成
+    """
+
+    def __init__(self, num_envs, seed=None, max_episode_steps=MAX_EPISODE_STEPS, normalize_obs=False,
+                 obs_mode="absolute", num_obstacles=1):
+        BatchDecisionEnv.__init__(self, num_envs, seed=seed, max_episode_steps=max_episode_steps,
+                                  normalize_obs=normalize_obs, obs_mode=obs_mode, num_obstacles=num_obstacles)
+        VecEnv.__init__(self, num_envs, self.observation_space, self.action_space)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self):
+        obs = BatchDecisionEnv.reset(self, seed=self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return obs
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        return BatchDecisionEnv.step(self, self._actions)
+
+    def close(self):
+        pass
+
+    def _is_slot_attr(self, value):
+        """每个槽位一行的状态数组（ego_pos、elapsed_steps 等），其余属性由所有槽位共享"""
+        return isinstance(value, np.ndarray) and value.ndim >= 1 and len(value) == self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        """状态数组返回各槽位的行，共享属性对每个索引返回同一个值"""
+        value = getattr(self, attr_name)
+        if self._is_slot_attr(value):
+            return [value[i].copy() for i in self._get_indices(indices)]
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        """状态数组只写入指定槽位；共享属性只能对全部槽位设置"""
+        indices = list(self._get_indices(indices))
+        current = getattr(self, attr_name, None)
+        if self._is_slot_attr(current):
+            current[indices] = value
+        elif sorted(indices) == list(range(self.num_envs)):
+            setattr(self, attr_name, value)
+        else:
+            raise ValueError(f"{attr_name} 由所有槽位共享，不能只对部分槽位设置")
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """
+        槽位没有独立的环境对象，只支持 reset：重置指定槽位（reset_slots），返回各槽位的 (obs, info)
+        """
+        if method_name != "reset":
+            raise NotImplementedError(f"DecisionVecEnv 的槽位不支持单独调用 {method_name}（只支持 reset）")
+        if method_args or method_kwargs:
+            raise ValueError("DecisionVecEnv 的槽位重置不接受参数（种子见 seed()）")
+        idx = np.array(list(self._get_indices(indices)), dtype=np.int64)
+        self.reset_slots(idx)
+        obs = self._get_obs()
+        return [(obs[i], {}) for i in idx]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+def _env_command(envs, cmd, data):
+    """工作进程中的 get_attr / set_attr / env_method，data 的最后一项为进程内的环境下标列表"""
+    if cmd == "get_attr":
+        attr_name, local = data
+        return [getattr(envs[j], attr_name) for j in local]
+    if cmd == "set_attr":
+        attr_name, value, local = data
+        for j in local:
+            setattr(envs[j], attr_name, value)
+        return None
+    method_name, args, kwargs, local = data
+    return [getattr(envs[j], method_name)(*args, **kwargs) for j in local]
+
+
+def _worker(remote, parent_remote, start, count, buffers, env_kwargs):
+    """工作进程：运行 count 个 DecisionEnv，结果直接写入共享内存中属于自己的切片"""
+    parent_remote.close()
+    num_envs = len(buffers[1])
+    obs_buf = np.frombuffer(buffers[0], dtype=np.float32).reshape(num_envs, 6)[start:start + count]
+    rew_buf = np.frombuffer(buffers[1], dtype=np.float32)[start:start + count]
+    done_buf = np.frombuffer(buffers[2], dtype=np.bool_)[start:start + count]
+    act_buf = np.frombuffer(buffers[3], dtype=np.int32)[start:start + count]
+
+    envs = [DecisionEnv(**env_kwargs) for _ in range(count)]
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                # 只回传非空的info（即结束的环境），避免每步序列化大量空字典
+                infos = {}
+                for j, env in enumerate(envs):
+                    observation, reward, terminated, truncated, info = env.step(int(act_buf[j]))
+                    done = terminated or truncated
+                    if done:
+                        info["TimeLimit.truncated"] = truncated and not terminated
+                        info["terminal_observation"] = observation
+                        observation, _ = env.reset()
+                        infos[j] = info
+                    obs_buf[j] = observation
+                    rew_buf[j] = reward
+                    done_buf[j] = done
+                remote.send(infos)
+            elif cmd == "reset":
+                for j, env in enumerate(envs):
+                    obs_buf[j], _ = env.reset(seed=data[j])
+                remote.send(None)
+            elif cmd in ("get_attr", "set_attr", "env_method"):
+                # 出错时把异常发回主进程（由 get_attr 等抛出），工作进程继续运行
+                try:
+                    remote.send(_env_command(envs, cmd, data))
+                except Exception as e:
+                    remote.send(e)
+            elif cmd == "close":
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+
+class SubprocDecisionVecEnv(VecEnv):
+    """
+    多进程决策环境（SB3 VecEnv 接口）
+
+    与 SB3 的 SubprocVecEnv 不同，每个进程运行 envs_per_worker 个环境，
+    观察、奖励、done 和动作都放在共享内存中，管道只传递命令和结束时的 info
+
+    :param num_workers: 工作进程数
+    :param envs_per_worker: 每个进程中的环境数
+    :param seed: 随机种子，第 i 个环境使用 seed + i
+    :param start_method: 进程启动方式，默认 forkserver（不可用时为 spawn）
+    :param max_episode_steps: episode步数上限，None为不限制
+    :param normalize_obs: 是否输出归一化观察
+    :param obs_mode: 观察模式，"absolute" 或 "egocentric"
+    :param num_obstacles: 每个环境的障碍物数
+    """
+
+    def __init__(self, num_workers, envs_per_worker=1, seed=None, start_method=None,
+                 max_episode_steps=MAX_EPISODE_STEPS, normalize_obs=False, obs_mode="absolute",
+                 num_obstacles=1):
+        self.render_mode = None
+        self.waiting = False
+        self.closed = False
+        num_envs = num_workers * envs_per_worker
+
+        if start_method is None:
+            forkserver_available = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver_available else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # 共享内存：观察、奖励、done、动作
+        buffers = (
+            ctx.RawArray("f", num_envs * 6),
+            ctx.RawArray("f", num_envs),
+            ctx.RawArray("b", num_envs),
+            ctx.RawArray("i", num_envs),
+        )
+        self._obs_buf = np.frombuffer(buffers[0], dtype=np.float32).reshape(num_envs, 6)
+        self._rew_buf = np.frombuffer(buffers[1], dtype=np.float32)
+        self._done_buf = np.frombuffer(buffers[2], dtype=np.bool_)
+        self._act_buf = np.frombuffer(buffers[3], dtype=np.int32)
+
+        self.slices = [(w * envs_per_worker, envs_per_worker) for w in range(num_workers)]
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(num_workers)])
+        self.processes = []
+        for work_remote, remote, (start, count) in zip(self.work_remotes, self.remotes, self.slices):
+            env_kwargs = {"max_episode_steps": max_episode_steps, "normalize_obs": normalize_obs, "obs_mode": obs_mode,
+                          "num_obstacles": num_obstacles}
+            args = (work_remote, remote, start, count, buffers, env_kwargs)
+            # daemon=True: 主进程崩溃时不会挂起
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        super().__init__(num_envs, observation_space(normalize_obs, obs_mode), spaces.Discrete(4))
+        # 种子在下一次reset时传给各环境；不设种子时各环境的np_random独立初始化
+        if seed is not None:
+            self.seed(seed)
+
+    def reset(self):
+        for remote, (start, count) in zip(self.remotes, self.slices):
+            remote.send(("reset", self._seeds[start:start + count]))
+        for remote in self.remotes:
+            remote.recv()
+        self._reset_seeds()
+        self._reset_options()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._obs_buf.copy()
+
+    def step_async(self, actions):
+        self._act_buf[:] = np.asarray(actions).reshape(self.num_envs)
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [{} for _ in range(self.num_envs)]
+        for remote, (start, _) in zip(self.remotes, self.slices):
+            for j, info in remote.recv().items():
+                infos[start + j] = info
+        self.waiting = False
+        return self._obs_buf.copy(), self._rew_buf.copy(), self._done_buf.copy(), infos
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def _request(self, indices, make_command):
+        """
+        把 indices 按工作进程分组，向每个相关进程发送 make_command(进程内的环境下标列表) 生成的命令，
+        返回按 indices 顺序排列的结果
+        """
+        indices = list(self._get_indices(indices))
+        groups = {}
+        for pos, i in enumerate(indices):
+            worker = next(w for w, (start, count) in enumerate(self.slices) if start <= i < start + count)
+            groups.setdefault(worker, []).append((pos, i - self.slices[worker][0]))
+        for worker, items in groups.items():
+            self.remotes[worker].send(make_command([j for _, j in items]))
+        results = [None] * len(indices)
+        error = None
+        # 先收齐所有进程的回复，保持管道同步，再抛出其中的异常
+        for worker, items in groups.items():
+            replies = self.remotes[worker].recv()
+            if isinstance(replies, Exception):
+                error = replies
+            elif replies is not None:
+                for (pos, _), reply in zip(items, replies):
+                    results[pos] = reply
+        if error is not None:
+            raise error
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        return self._request(indices, lambda local: ("get_attr", (attr_name, local)))
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._request(indices, lambda local: ("set_attr", (attr_name, value, local)))
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._request(indices, lambda local: ("env_method", (method_name, method_args, method_kwargs, local)))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -1,97 +1,53 @@
 """
-可视化20个episode的路线行为
+可视化episode的路线行为
+少量episode逐条绘制轨迹，大量episode绘制轨迹密度图
 """
-from stable_baselines3 import PPO
-from env import DecisionEnv
+from numpy_policy import load_policy
+from rollout import run_episodes, OUTCOME_NAMES
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.colors import to_rgb
 
-def visualize_episodes(num_episodes=20):
-    """可视化多个episode的轨迹"""
-    env = DecisionEnv()
-    model = PPO.load("ppo_decision")
-    
-    # 存储所有episode的数据
+# 超过该episode数时默认使用密度图
+DENSITY_THRESHOLD = 500
+OUTCOME_COLORS = {'success': 'green', 'collision': 'red', 'timeout': 'orange'}
+
+
+def _draw_lines(ax, rollout_result):
+    """逐条绘制每个episode的轨迹"""
+    # 每个episode的数据（轨迹为列式结果中的切片，不复制）
     episodes_data = []
-    
-    print(f"Running {num_episodes} episodes and recording trajectories...")
-    
-    for episode in range(num_episodes):
-        obs, _ = env.reset()
-        trajectory = [env.ego_pos.copy()]  # 记录轨迹
-        destination = env.destination.copy()
-        obs_pos = env.obs_pos.copy()
-        initial_pos = env.ego_pos.copy()
-        
-        total_reward = 0
-        steps = 0
-        
-        while steps < 200:
-            action, _ = model.predict(obs, deterministic=True)
-            action = int(action)
-            obs, reward, done, truncated, _ = env.step(action)
-            
-            trajectory.append(env.ego_pos.copy())
-            total_reward += reward
-            steps += 1
-            
-            if done or truncated:
-                break
-        
-        # 判断episode结果
-        final_pos = env.ego_pos.copy()
-        dist_to_dest = np.linalg.norm(destination - final_pos)
-        dist_to_obs = np.linalg.norm(obs_pos - final_pos)
-        
-        if dist_to_obs < 2.0:
-            result = "collision"
-        elif dist_to_dest < 8.0:  # 更新到达阈值，与env.py和evaluate.py一致
-            result = "success"
-        else:
-            result = "timeout"
-        
+    for episode in range(rollout_result.num_episodes):
+        result_name = OUTCOME_NAMES[rollout_result.outcome[episode]]
         episodes_data.append({
-            'trajectory': np.array(trajectory),
-            'destination': destination,
-            'obs_pos': obs_pos,
-            'initial_pos': initial_pos,
-            'result': result,
-            'total_reward': total_reward,
-            'steps': steps
+            'trajectory': rollout_result.trajectory(episode),
+            'destination': rollout_result.destination[episode],
+            'obs_pos': rollout_result.obs_pos[episode],
+            'result': result_name,
+            'total_reward': rollout_result.total_reward[episode],
+            'steps': rollout_result.length[episode]
         })
         
-        print(f"Episode {episode + 1:2d}: {result:8s} | Reward: {total_reward:6.2f} | Steps: {steps:3d}")
-    
-    # 绘制轨迹图
-    fig, ax = plt.subplots(figsize=(14, 10))
+        print(f"Episode {episode + 1:2d}: {result_name:8s} | Reward: {rollout_result.total_reward[episode]:6.2f} | "
+              f"Steps: {rollout_result.length[episode]:3d}")
     
-    # 统计
-    success_count = sum(1 for ep in episodes_data if ep['result'] == 'success')
-    collision_count = sum(1 for ep in episodes_data if ep['result'] == 'collision')
-    timeout_count = sum(1 for ep in episodes_data if ep['result'] == 'timeout')
-    
-    # 绘制每个episode的轨迹
+    # 绘制每个episode的轨迹，每类结果只在第一次出现时加图例
+    labeled = set()
     for i, ep_data in enumerate(episodes_data):
         trajectory = ep_data['trajectory']
         result = ep_data['result']
+        color = OUTCOME_COLORS[result]
+        label = result.capitalize() if result not in labeled else ''
+        labeled.add(result)
         
-        # 根据结果选择颜色和样式
-        if result == 'success':
-            color = 'green'
-            alpha = 0.6
-            linewidth = 1.5
-            label = 'Success' if i == 0 or sum(1 for j in range(i) if episodes_data[j]['result'] == 'success') == 0 else ''
-        elif result == 'collision':
-            color = 'red'
-            alpha = 0.6
-            linewidth = 1.5
-            label = 'Collision' if i == 0 or sum(1 for j in range(i) if episodes_data[j]['result'] == 'collision') == 0 else ''
-        else:  # timeout
-            color = 'orange'
+        # 根据结果选择样式
+        if result == 'timeout':
             alpha = 0.4
             linewidth = 1.0
-            label = 'Timeout' if i == 0 or sum(1 for j in range(i) if episodes_data[j]['result'] == 'timeout') == 0 else ''
+        else:
+            alpha = 0.6
+            linewidth = 1.5
         
         # 绘制轨迹线
         ax.plot(trajectory[:, 0], trajectory[:, 1], 
@@ -106,8 +62,7 @@ def visualize_episodes(num_episodes=20):
         ax.scatter(trajectory[-1, 0], trajectory[-1, 1], 
                   color=color, marker=end_marker, s=100, alpha=0.8, zorder=5)
     
-    # 绘制目标和障碍物（使用第一个episode的位置作为参考，因为它们可能不同）
-    # 实际上每个episode的目标和障碍物位置可能不同，我们绘制所有
+    # 绘制目标和障碍物（每个episode的目标和障碍物位置不同，我们绘制所有）
     for i, ep_data in enumerate(episodes_data):
         # 目标点
         ax.scatter(ep_data['destination'][0], ep_data['destination'][1], 
@@ -121,11 +76,83 @@ def visualize_episodes(num_episodes=20):
         ax.scatter(ep_data['obs_pos'][0], ep_data['obs_pos'][1], 
                   color='darkred', marker='s', s=100, alpha=0.8, zorder=6,
                   label='Obstacle' if i == 0 else '')
+
+
+def _draw_density(ax, rollout_result, cell_size=1.0, bound=100.0, chunk_episodes=10_000):
+    """
+    把所有轨迹点按结果类别统计到 cell_size 大小的网格中，合成为一张图
+    每类的访问次数取对数后按该类颜色叠加，只调用一次 imshow
+    """
+    num_cells = int(round(2 * bound / cell_size)) + 1
+    # 网格中心对齐整数格点（ego只在1.0单位的格点上移动）
+    low = -bound - cell_size / 2
+    counts = np.zeros(3 * num_cells * num_cells, dtype=np.int64)
+    for start in range(0, rollout_result.num_episodes, chunk_episodes):
+        chunk = rollout_result.episodes(start, min(start + chunk_episodes, rollout_result.num_episodes))
+        positions = np.asarray(chunk.positions)
+        outcome = chunk.outcome[chunk.point_episode()].astype(np.int64)
+        ix = np.floor((positions[:, 0] - low) / cell_size).astype(np.int64)
+        iy = np.floor((positions[:, 1] - low) / cell_size).astype(np.int64)
+        inside = (ix >= 0) & (ix < num_cells) & (iy >= 0) & (iy < num_cells)
+        flat = (outcome * num_cells + iy) * num_cells + ix
+        counts += np.bincount(flat[inside], minlength=len(counts))
+    counts = counts.reshape(3, num_cells, num_cells)
+    
+    # 对数强度，按颜色在白色背景上做减色叠加
+    intensity = np.log1p(counts) / max(np.log1p(counts.max()), 1e-12)
+    colors = np.array([to_rgb(OUTCOME_COLORS[name]) for name in OUTCOME_NAMES])
+    image = np.clip(1.0 - np.einsum('cyx,ck->yxk', intensity, 1.0 - colors), 0.0, 1.0)
+    extent = [low, low + num_cells * cell_size, low, low + num_cells * cell_size]
+    ax.imshow(image, origin='lower', extent=extent, interpolation='nearest', zorder=1)
+    
+    # 只显示有访问的区域
+    visited_y, visited_x = np.nonzero(counts.sum(axis=0))
+    if len(visited_x):
+        margin = 5 * cell_size
+        ax.set_xlim(low + visited_x.min() * cell_size - margin, low + (visited_x.max() + 1) * cell_size + margin)
+        ax.set_ylim(low + visited_y.min() * cell_size - margin, low + (visited_y.max() + 1) * cell_size + margin)
+    
+    # 目标和障碍物各用一次scatter绘制
+    ax.scatter(rollout_result.destination[:, 0], rollout_result.destination[:, 1],
+               color='gold', marker='*', s=2, alpha=0.05, zorder=2, label='Destination')
+    ax.scatter(rollout_result.obs_pos[:, 0], rollout_result.obs_pos[:, 1],
+               color='darkred', marker='s', s=2, alpha=0.05, zorder=2, label='Obstacle')
+    # 图例用的空线条
+    for name in OUTCOME_NAMES:
+        ax.plot([], [], color=OUTCOME_COLORS[name], linewidth=6, label=name.capitalize())
+
+
+def visualize_episodes(num_episodes=20, policy_path="ppo_decision", num_envs=256, seed=None, rollout_result=None,
+                       mode=None, show=True):
+    """
+    可视化多个episode的轨迹
+    rollout_result: 已有的 RolloutResult，传入时直接读取，不再重新运行
+    mode: "lines" 逐条绘制轨迹；"density" 绘制所有轨迹点的访问次数网格；
+          None 时episode数超过 DENSITY_THRESHOLD 使用 "density"，否则使用 "lines"
+    show: 保存后是否显示图形；图形最后总会关闭（常驻进程中反复调用时不累积）
+    """
+    if rollout_result is None:
+        print(f"Running {num_episodes} episodes and recording trajectories...")
+        rollout_result = run_episodes(load_policy(policy_path), num_episodes, num_envs=num_envs, seed=seed)
+    num_episodes = rollout_result.num_episodes
+    if mode is None:
+        mode = "density" if num_episodes > DENSITY_THRESHOLD else "lines"
+    
+    # 统计
+    outcome_counts = np.bincount(rollout_result.outcome, minlength=3)
+    success_count, collision_count, timeout_count = (int(c) for c in outcome_counts)
+    
+    # 绘制轨迹图
+    fig, ax = plt.subplots(figsize=(14, 10))
+    if mode == "density":
+        _draw_density(ax, rollout_result)
+    else:
+        _draw_lines(ax, rollout_result)
     
     # 设置图形属性
     ax.set_xlabel('X Position', fontsize=12)
     ax.set_ylabel('Y Position', fontsize=12)
-    ax.set_title(f'20 Episodes Trajectories\n'
+    ax.set_title(f'{num_episodes} Episodes Trajectories\n'
                 f'Success: {success_count} | Collision: {collision_count} | Timeout: {timeout_count}', 
                 fontsize=14, fontweight='bold')
     ax.grid(True, alpha=0.3)
@@ -142,9 +169,12 @@ def visualize_episodes(num_episodes=20):
             verticalalignment='top', bbox=props)
     
     plt.tight_layout()
-    plt.savefig('trajectories_20_episodes.png', dpi=150, bbox_inches='tight')
-    print(f"\nTrajectory plot saved as: trajectories_20_episodes.png")
-    plt.show()
+    save_path = f'trajectories_{num_episodes}_episodes.png'
+    plt.savefig(save_path, dpi=150, bbox_inches='tight')
+    print(f"\nTrajectory plot saved as: {save_path}")
+    if show:
+        plt.show()
+    plt.close(fig)
 
 if __name__ == "__main__":
     visualize_episodes(num_episodes=20)